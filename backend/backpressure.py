@@ -0,0 +1,145 @@
+import asyncio
+import logging
+
+from settings import load_settings
+
+# Stage sizes for the ingest -> STT -> translate -> broadcast pipeline
+UPLOAD_WORKERS = 1  # Concurrent upload transcriptions (each runs a CPU-bound model)
+MAX_QUEUED_UPLOADS = 8  # Uploads waiting behind the workers
+MAX_PENDING_UPLOAD_BYTES = 64 * 2 ** 20  # Encoded audio held in the upload stage, queued or in progress
+FINAL_QUEUE_SIZE = 64
+REALTIME_QUEUE_SIZE = 4
+MAX_MESSAGE_BYTES = 2 ** 20  # Largest WebSocket message (i.e. upload) accepted
+MAX_INCOMING_MESSAGES = 4  # Unread messages buffered per connection before TCP pushes back
+BROADCAST_SEND_TIMEOUT_S = 5.0  # A client that cannot take a message this fast is disconnected
+
+# What a full stage does with a new item:
+#   block       - wait for room (pushes back on the producer)
+#   drop_oldest - evict the oldest queued item to make room
+#   drop_newest - refuse the new item
+OVERLOAD_POLICIES = {
+    "upload": "drop_newest",
+    "final": "block",
+    "realtime": "drop_oldest",
+}
+VALID_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+def load_overload_policies(settings=None):
+    """Default policies, overridden by the optional "overload_policies" object in settings.json."""
+    policies = dict(OVERLOAD_POLICIES)
+    overrides = (settings if settings is not None else load_settings()).get("overload_policies", {})
+    for stage, policy in overrides.items():
+        if stage in policies and policy in VALID_POLICIES:
+            policies[stage] = policy
+        else:
+            logging.warning(f"Ignoring overload policy {stage}={policy}.")
+    return policies
+
+
+class BoundedStage:
+    """A bounded asyncio.Queue with an overload policy and counters for get_metrics."""
+
+    def __init__(self, name, maxsize, policy="block"):
+        if policy not in VALID_POLICIES:
+            raise ValueError(f"Unknown overload policy for {name}: {policy}")
+        self.name = name
+        self.policy = policy
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.accepted = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    async def put(self, item):
+        """Returns (accepted, evicted): evicted is the item dropped to make room, if any."""
+        evicted = None
+        if self.queue.full():
+            if self.policy == "drop_newest":
+                self.dropped += 1
+                logging.debug(f"{self.name} stage full, dropped newest item.")
+                return False, None
+            if self.policy == "drop_oldest":
+                evicted = self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+                logging.debug(f"{self.name} stage full, dropped oldest item.")
+        await self.queue.put(item)
+        self.accepted += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+        return True, evicted
+
+    async def get(self):
+        return await self.queue.get()
+
+    def task_done(self):
+        self.queue.task_done()
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "policy": self.policy,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "high_water": self.high_water,
+        }
+
+
+class UploadAdmission:
+    """Admission control for uploads: a BoundedStage plus a ceiling on buffered audio bytes."""
+
+    def __init__(self, policy, max_queued=MAX_QUEUED_UPLOADS, max_pending_bytes=MAX_PENDING_UPLOAD_BYTES, slots=UPLOAD_WORKERS):
+        self.stage = BoundedStage("upload", max_queued, policy)
+        self.slots = slots  # Uploads processed at once; the rest wait their turn
+        self.max_pending_bytes = max_pending_bytes
+        self.pending_bytes = 0
+        self.peak_pending_bytes = 0
+        self.in_progress = 0
+        self.rejected_for_bytes = 0
+
+    async def submit(self, websocket, audio_bytes):
+        """Queues an upload. Returns (place in the waiting line, evicted job) or (None, None) if rejected.
+
+        Place 0 means a slot is free and the upload is not waiting.
+        """
+        if self.pending_bytes + len(audio_bytes) > self.max_pending_bytes:
+            self.rejected_for_bytes += 1
+            return None, None
+        # Reserve the bytes before a "block" policy can suspend us, so the ceiling holds
+        self.pending_bytes += len(audio_bytes)
+        self.peak_pending_bytes = max(self.peak_pending_bytes, self.pending_bytes)
+        accepted, evicted = await self.stage.put((websocket, audio_bytes))
+        if not accepted:
+            self.pending_bytes -= len(audio_bytes)
+            return None, None
+        if evicted is not None:
+            self.pending_bytes -= len(evicted[1])
+        return self.place_in_line(), evicted
+
+    def place_in_line(self):
+        # qsize() still counts uploads that idle dispatchers were woken for but have not taken yet
+        return max(self.stage.qsize() - (self.slots - self.in_progress), 0)
+
+    async def next_job(self):
+        job = await self.stage.get()
+        self.in_progress += 1
+        return job
+
+    def job_done(self, job):
+        self.in_progress -= 1
+        self.pending_bytes -= len(job[1])
+        self.stage.task_done()
+
+    def metrics(self) -> dict:
+        metrics = self.stage.metrics()
+        metrics.update({
+            "in_progress": self.in_progress,
+            "pending_bytes": self.pending_bytes,
+            "peak_pending_bytes": self.peak_pending_bytes,
+            "max_pending_bytes": self.max_pending_bytes,
+            "rejected_for_bytes": self.rejected_for_bytes,
+        })
+        return metrics
@@ -0,0 +1,194 @@
+"""Message bus between the WebSocket fan-out tier and the STT/translation workers.
+
+Two primitives are needed:
+  * publish/subscribe for messages every subscriber must see (subtitles, worker events)
+  * push_job/pull_job for uploads, which exactly one worker must take
+
+InProcessBus serves the default single-process mode. RedisBus works with any server
+speaking the Redis protocol (Redis, Valkey, KeyDB, ...), and ZmqBus talks to the small
+broker started with `python bus.py zmq-broker`. Pick one with BUS_URL:
+
+    memory://                 (default)
+    redis://localhost:6379/0
+    zmq://localhost:5560      (broker binds this port and the next three)
+"""
+import os
+import json
+import asyncio
+import logging
+import argparse
+from urllib.parse import urlparse
+
+BUS_URL = os.getenv("BUS_URL", "memory://")
+CHANNEL_PREFIX = "live_stt:"
+
+# Channels
+SUBTITLES = "subtitles"  # Messages for clients: final/realtime/status/error
+EVENTS = "events"  # Worker -> fan-out bookkeeping: job_done, metrics
+CONTROL = "control"  # Fan-out -> workers: live audio start/stop
+
+SUBSCRIBER_QUEUE_SIZE = 256  # In-process only; a full subscriber pushes back on publishers
+
+
+class InProcessBus:
+    def __init__(self):
+        self._subscribers = {}  # channel -> list of asyncio.Queue
+        self._jobs = asyncio.Queue()
+
+    async def publish(self, channel, message: dict):
+        for queue in list(self._subscribers.get(channel, [])):
+            await queue.put(message)
+
+    async def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].remove(queue)
+
+    async def push_job(self, job_id: str, audio_bytes: bytes):
+        await self._jobs.put((job_id, audio_bytes))
+
+    async def pull_job(self):
+        return await self._jobs.get()
+
+    async def close(self):
+        pass
+
+
+class RedisBus:
+    def __init__(self, url):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("BUS_URL uses redis:// but the 'redis' package is not installed (pip install redis).") from e
+        self._redis = redis.from_url(url)
+        self._jobs_key = f"{CHANNEL_PREFIX}jobs"
+
+    async def publish(self, channel, message: dict):
+        await self._redis.publish(CHANNEL_PREFIX + channel, json.dumps(message))
+
+    async def subscribe(self, channel):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(CHANNEL_PREFIX + channel)
+        try:
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    yield json.loads(item["data"])
+        finally:
+            await pubsub.aclose() if hasattr(pubsub, "aclose") else await pubsub.close()
+
+    async def push_job(self, job_id: str, audio_bytes: bytes):
+        await self._redis.lpush(self._jobs_key, job_id.encode() + b"\n" + audio_bytes)
+
+    async def pull_job(self):
+        _, data = await self._redis.brpop(self._jobs_key)
+        job_id, audio_bytes = data.split(b"\n", 1)
+        return job_id.decode(), audio_bytes
+
+    async def close(self):
+        await self._redis.aclose() if hasattr(self._redis, "aclose") else await self._redis.close()
+
+
+def _zmq_ports(port):
+    return {
+        "publish": port,  # Publishers connect (broker XSUB)
+        "subscribe": port + 1,  # Subscribers connect (broker XPUB)
+        "push": port + 2,  # Job producers connect (broker PULL)
+        "pull": port + 3,  # Workers connect (broker PUSH)
+    }
+
+
+class ZmqBus:
+    def __init__(self, url):
+        try:
+            import zmq
+            import zmq.asyncio
+        except ImportError as e:
+            raise RuntimeError("BUS_URL uses zmq:// but the 'pyzmq' package is not installed (pip install pyzmq).") from e
+        self._zmq = zmq
+        parsed = urlparse(url)
+        self._host = parsed.hostname or "localhost"
+        self._ports = _zmq_ports(parsed.port or 5560)
+        self._context = zmq.asyncio.Context.instance()
+        self._pub = self._connect(zmq.PUB, "publish")
+        self._push = self._connect(zmq.PUSH, "push")
+        self._pull = None  # Only workers pull; connecting lazily keeps fan-out nodes out of the job rotation
+
+    def _connect(self, socket_type, role):
+        sock = self._context.socket(socket_type)
+        sock.connect(f"tcp://{self._host}:{self._ports[role]}")
+        return sock
+
+    async def publish(self, channel, message: dict):
+        await self._pub.send_multipart([(CHANNEL_PREFIX + channel).encode(), json.dumps(message).encode()])
+
+    async def subscribe(self, channel):
+        topic = (CHANNEL_PREFIX + channel).encode()
+        sock = self._connect(self._zmq.SUB, "subscribe")
+        sock.setsockopt(self._zmq.SUBSCRIBE, topic)
+        try:
+            while True:
+                received_topic, payload = await sock.recv_multipart()
+                if received_topic == topic:  # SUBSCRIBE is a prefix match
+                    yield json.loads(payload)
+        finally:
+            sock.close(linger=0)
+
+    async def push_job(self, job_id: str, audio_bytes: bytes):
+        await self._push.send_multipart([job_id.encode(), audio_bytes])
+
+    async def pull_job(self):
+        if self._pull is None:
+            self._pull = self._connect(self._zmq.PULL, "pull")
+        job_id, audio_bytes = await self._pull.recv_multipart()
+        return job_id.decode(), audio_bytes
+
+    async def close(self):
+        for sock in (self._pub, self._push, self._pull):
+            if sock is not None:
+                sock.close(linger=0)
+
+
+def create_bus(url=BUS_URL):
+    scheme = urlparse(url).scheme
+    if scheme in ("", "memory"):
+        return InProcessBus()
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisBus(url)
+    if scheme == "zmq":
+        return ZmqBus(url)
+    raise ValueError(f"Unsupported BUS_URL: {url}")
+
+
+def run_zmq_broker(port):
+    """Forwards pub/sub traffic and load-balances jobs between fan-out nodes and workers."""
+    import threading
+    import zmq
+
+    context = zmq.Context.instance()
+    ports = _zmq_ports(port)
+
+    def forward(front_type, front_port, back_type, back_port):
+        front = context.socket(front_type)
+        front.bind(f"tcp://*:{front_port}")
+        back = context.socket(back_type)
+        back.bind(f"tcp://*:{back_port}")
+        zmq.proxy(front, back)
+
+    threading.Thread(target=forward, args=(zmq.PULL, ports["push"], zmq.PUSH, ports["pull"]), daemon=True).start()
+    logging.info(f"ZeroMQ bus broker listening on ports {port}-{port + 3}")
+    forward(zmq.XSUB, ports["publish"], zmq.XPUB, ports["subscribe"])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Message bus utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    broker = subparsers.add_parser("zmq-broker", help="Run the ZeroMQ broker for zmq:// bus URLs")
+    broker.add_argument("--port", type=int, default=5560)
+    args = parser.parse_args()
+    if args.command == "zmq-broker":
+        run_zmq_broker(args.port)
@@ -0,0 +1,168 @@
+import time
+import logging
+import threading
+import collections
+import concurrent.futures
+
+STRATEGIES = ("single", "fallback", "hedged")
+LATENCY_WINDOW = 100  # Recent calls per backend used for the p95 (seconds per unit of job size)
+MIN_LATENCY_SAMPLES = 10  # Below this, hedge after DEFAULT_HEDGE_DELAY_S
+DEFAULT_HEDGE_DELAY_S = 2.0
+MIN_JOB_SIZE = 0.1  # Floor for job_size so near-empty jobs do not blow up the per-unit latency
+HEDGE_THREADS_PER_BACKEND = 4
+
+
+class EngineCancelled(Exception):
+    """Raised by a backend that noticed its cancel event (the other hedge won)."""
+
+
+class EmptyResult(Exception):
+    """A backend answered but had nothing usable (e.g. silence); kept in case no one does better."""
+
+    def __init__(self, name, result):
+        super().__init__(f"Empty result from {name}")
+        self.result = result
+
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self.samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+
+class EngineSelector:
+    """Runs one job through named backends according to a strategy.
+
+    Backends are callables taking the job input and a ``cancel`` threading.Event they
+    may poll to stop early. Strategies:
+      single   - primary only
+      fallback - primary, then the fallback if it raises or returns an unusable result
+      hedged   - primary; if it is still running after its p95 latency, start the
+                 fallback alongside it, keep whichever usable result arrives first and
+                 cancel the other
+
+    ``job_size`` measures a job (audio seconds, characters); latencies are tracked per
+    unit of it so a long upload and a short phrase are judged against the same p95.
+    """
+
+    def __init__(self, kind, backends, primary, fallback=None, strategy="fallback", is_usable=bool, job_size=lambda job: 1):
+        if primary not in backends:
+            raise ValueError(f"Unknown {kind} backend: {primary}")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown {kind} strategy: {strategy}")
+        self.kind = kind
+        self.backends = backends
+        self.primary = primary
+        self.fallback = fallback if fallback in backends and fallback != primary else None
+        self.strategy = strategy if self.fallback else "single"
+        self.is_usable = is_usable
+        self.job_size = job_size
+        self.latency = {name: LatencyTracker() for name in backends}
+        self.calls = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self.wins = collections.Counter()
+        # One pool per backend: a cloud call that hangs after losing a hedge keeps its thread
+        # until it times out, and must not leave the local model queued behind it
+        self._pools = {
+            name: concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_THREADS_PER_BACKEND, thread_name_prefix=f"{kind}-{name}")
+            for name in backends
+        }
+        logging.info(f"{kind} engine: {self.primary} (strategy {self.strategy}, fallback {self.fallback})")
+
+    def _call(self, name, job, cancel):
+        started = time.monotonic()
+        result = self.backends[name](job, cancel=cancel)
+        # Record even if this call lost a hedge: backends that cannot stop early (Google) are
+        # exactly the slow ones, and leaving them out would drag the p95 down. Those that did
+        # stop raised EngineCancelled and never get here.
+        self.latency[name].record((time.monotonic() - started) / self._size(job))
+        if not self.is_usable(result):
+            raise EmptyResult(name, result)
+        return result
+
+    def run(self, job):
+        self.calls += 1
+        if self.strategy == "hedged":
+            return self._run_hedged(job)
+        try:
+            result = self._call(self.primary, job, threading.Event())
+            self.wins[self.primary] += 1
+            return result
+        except Exception as e:
+            if self.strategy == "single":
+                raise
+            logging.warning(f"{self.kind} {self.primary} failed: {e}. Falling back to {self.fallback}.")
+        self.fallbacks += 1
+        result = self.backends[self.fallback](job, cancel=threading.Event())
+        self.wins[self.fallback] += 1
+        return result
+
+    def _size(self, job):
+        return max(self.job_size(job), MIN_JOB_SIZE)
+
+    def hedge_delay(self, job):
+        p95 = self.latency[self.primary].p95()
+        return p95 * self._size(job) if p95 is not None else DEFAULT_HEDGE_DELAY_S
+
+    def _run_hedged(self, job):
+        cancels = {self.primary: threading.Event(), self.fallback: threading.Event()}
+        futures = {self._pools[self.primary].submit(self._call, self.primary, job, cancels[self.primary]): self.primary}
+        delay = self.hedge_delay(job)
+        done, _ = concurrent.futures.wait(futures, timeout=delay)
+        primary_failed = any(future.exception() for future in done)
+        if not done or primary_failed:
+            if primary_failed:
+                self.fallbacks += 1
+            else:
+                self.hedges += 1
+                logging.info(f"{self.kind} {self.primary} slower than {delay:.2f}s, hedging with {self.fallback}.")
+            futures[self._pools[self.fallback].submit(self._call, self.fallback, job, cancels[self.fallback])] = self.fallback
+
+        errors = []
+        empty = None
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                error = future.exception()
+                if isinstance(error, EmptyResult):
+                    empty = error
+                    continue
+                if error is not None:
+                    errors.append(f"{name}: {error}")
+                    continue
+                # First usable result wins; tell the loser to stop and drop whatever it returns
+                for other_future, other in futures.items():
+                    if other != name:
+                        cancels[other].set()
+                        other_future.cancel()
+                self.wins[name] += 1
+                return future.result()
+        if empty is not None:
+            return empty.result
+        raise RuntimeError(f"All {self.kind} backends failed: {'; '.join(errors)}")
+
+    def metrics(self) -> dict:
+        return {
+            "primary": self.primary,
+            "fallback": self.fallback,
+            "strategy": self.strategy,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "wins": dict(self.wins),
+            "p95_per_unit_s": {name: round(tracker.p95(), 4) for name, tracker in self.latency.items() if tracker.p95() is not None},
+        }
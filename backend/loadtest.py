@@ -0,0 +1,388 @@
+"""Load-test harness for the subtitle WebSocket server.
+
+Opens many subscriber connections (overlay displays) plus a pool of uploaders that
+replay audio over the same protocol the GUI uses, then reports delivery latency
+percentiles, dropped messages and the server's CPU and memory use.
+
+With --spawn the server is started from this directory with STUB_ENGINES=1, so no
+API keys, network access or model downloads are needed:
+
+    python loadtest.py --spawn --subscribers 300 --uploads 50 --audio ../audio_hindi.m4a
+"""
+import os
+import io
+import sys
+import json
+import time
+import wave
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import websockets
+
+from stub_engines import TAG_PATTERN, BYTES_PER_SECOND, audio_tag
+from backpressure import MAX_MESSAGE_BYTES
+
+SAMPLE_RATE = 16000
+MAX_UPLOAD_BYTES = MAX_MESSAGE_BYTES - 1024  # Leave room for the WAV header
+
+
+def load_pcm(path, clip_seconds):
+    """Returns 16 kHz mono int16 samples from a WAV, raw PCM or any ffmpeg-readable file."""
+    if path is None:
+        return synthetic_pcm(clip_seconds)
+    if path.endswith(".pcm") or path.endswith(".raw"):
+        with open(path, "rb") as f:
+            samples = np.frombuffer(f.read(), dtype=np.int16)
+    elif path.endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                return _decode_with_pydub(path, clip_seconds)
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    else:
+        return _decode_with_pydub(path, clip_seconds)
+    return samples[:int(clip_seconds * SAMPLE_RATE)]
+
+
+def _decode_with_pydub(path, clip_seconds):
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(path)[:int(clip_seconds * 1000)]
+    segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16)
+
+
+def synthetic_pcm(seconds):
+    # Speech-like enough for the stubs: a wobbling tone over low-level noise
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+    noise = 0.02 * np.random.default_rng(0).standard_normal(t.size)
+    return ((tone + noise) * 32767).astype(np.int16)
+
+
+def make_wav(samples, index):
+    """Wraps samples in a WAV, stamping the index into the first sample so every upload is distinct."""
+    samples = samples.copy()
+    samples[0] = index % 32768
+    pcm = samples.tobytes()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue(), audio_tag(pcm)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    return float(np.percentile(values, q))
+
+
+class Stats:
+    def __init__(self):
+        self.sent_at = {}  # tag -> time the uploader sent it
+        self.fanout_latencies = []  # server broadcast timestamp -> client receipt
+        self.e2e_latencies = []  # uploader send -> client receipt
+        self.received = {}  # subscriber id -> set of tags
+        self.disconnects = 0
+        self.errors = 0
+        self.busy = 0
+        self.rejected = 0
+
+
+class ServerMonitor:
+    """Samples CPU and RSS of a local server process from /proc."""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def _cpu_time(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks  # utime + stime
+
+    def _rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    async def run(self):
+        try:
+            last_cpu, last_wall = self._cpu_time(), time.monotonic()
+            while True:
+                await asyncio.sleep(self.interval)
+                cpu, wall = self._cpu_time(), time.monotonic()
+                self.cpu_samples.append(100 * (cpu - last_cpu) / (wall - last_wall))
+                self.rss_samples.append(self._rss_mb())
+                last_cpu, last_wall = cpu, wall
+        except (FileNotFoundError, ProcessLookupError):
+            pass  # Server exited or /proc is unavailable
+
+
+async def subscriber(uri, sub_id, stats, ready, stop):
+    stats.received[sub_id] = set()
+    try:
+        async with websockets.connect(uri, max_size=None, open_timeout=60) as ws:
+            ready.release()
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                now = time.time()
+                data = json.loads(message)
+                if data.get("type") != "final":
+                    continue
+                match = TAG_PATTERN.search(data.get("hindi", ""))
+                if not match:
+                    continue
+                tag = match.group(1)
+                stats.received[sub_id].add(tag)
+                if data.get("timestamp"):
+                    stats.fanout_latencies.append(now - datetime.fromisoformat(data["timestamp"]).timestamp())
+                if tag in stats.sent_at:
+                    stats.e2e_latencies.append(now - stats.sent_at[tag])
+    except (OSError, websockets.exceptions.WebSocketException, asyncio.TimeoutError):
+        stats.disconnects += 1
+        ready.release()
+
+
+async def uploader(uri, jobs, stats, samples, chunk_seconds, speed):
+    async with websockets.connect(uri, max_size=None, open_timeout=60) as ws:
+        drain = asyncio.create_task(_drain(ws, stats))
+        try:
+            while True:
+                try:
+                    index = jobs.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if chunk_seconds:
+                    # Streamed mode: send consecutive chunks paced at real time / speed
+                    step = int(chunk_seconds * SAMPLE_RATE)
+                    for n, offset in enumerate(range(0, len(samples), step)):
+                        payload, tag = make_wav(samples[offset:offset + step], index * 10000 + n)
+                        stats.sent_at[tag] = time.time()
+                        await ws.send(payload)
+                        await asyncio.sleep(chunk_seconds / speed)
+                else:
+                    payload, tag = make_wav(samples, index)
+                    stats.sent_at[tag] = time.time()
+                    await ws.send(payload)
+                    await asyncio.sleep(len(samples) / SAMPLE_RATE / speed)
+        finally:
+            drain.cancel()
+
+
+async def _drain(ws, stats):
+    # Uploaders receive broadcasts too; keep reading so the server never blocks on them
+    try:
+        async for message in ws:
+            data = json.loads(message)
+            if data.get("type") == "error":
+                stats.errors += 1
+            elif data.get("type") == "busy":
+                stats.busy += 1
+                if data.get("position") is None:
+                    stats.rejected += 1
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def fetch_server_metrics(uri):
+    async with websockets.connect(uri, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "get_metrics"}))
+        while True:
+            data = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+            if data.get("type") == "metrics":
+                return data
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def spawn_server(port, log_file):
+    env = dict(os.environ)
+    env.update({
+        "STUB_ENGINES": "1",
+        "WS_SERVER_PORT": str(port),
+        "SUBTITLE_HISTORY_DIR": tempfile.mkdtemp(prefix="loadtest-history-"),
+    })
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+
+
+async def run(args):
+    samples = load_pcm(args.audio, args.clip_seconds)
+    upload_bytes = len(samples) * 2 if not args.chunk_seconds else int(args.chunk_seconds * BYTES_PER_SECOND)
+    if upload_bytes > MAX_UPLOAD_BYTES:
+        raise SystemExit(f"Each upload would be {upload_bytes} bytes; the server accepts about {MAX_UPLOAD_BYTES}. "
+                         "Lower --clip-seconds or use --chunk-seconds.")
+
+    stats = Stats()
+    stop = asyncio.Event()
+    monitor_task = None
+    monitor = None
+    if args.server_pid:
+        monitor = ServerMonitor(args.server_pid)
+        monitor_task = asyncio.create_task(monitor.run())
+
+    ready = asyncio.Semaphore(0)
+    subscribers = []
+    for sub_id in range(args.subscribers):
+        subscribers.append(asyncio.create_task(subscriber(args.uri, sub_id, stats, ready, stop)))
+        if args.connect_rate:
+            await asyncio.sleep(1 / args.connect_rate)
+    for _ in range(args.subscribers):
+        await ready.acquire()
+    print(f"{args.subscribers - stats.disconnects} subscribers connected.")
+
+    jobs = asyncio.Queue()
+    for index in range(args.uploads):
+        jobs.put_nowait(index + 1)
+    started = time.monotonic()
+    await asyncio.gather(*[
+        uploader(args.uri, jobs, stats, samples, args.chunk_seconds, args.speed)
+        for _ in range(min(args.upload_concurrency, args.uploads))
+    ])
+
+    # Give the pipeline time to deliver what is still in flight
+    expected = set(stats.sent_at)
+    deadline = time.monotonic() + args.drain_timeout
+    while time.monotonic() < deadline:
+        # Rejected uploads never produce a subtitle, so they are not waited for
+        if all(len(expected - tags) <= stats.rejected for tags in stats.received.values()):
+            break
+        await asyncio.sleep(0.25)
+    elapsed = time.monotonic() - started
+    try:
+        server_metrics = await fetch_server_metrics(args.uri)
+    except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+        server_metrics = None
+    stop.set()
+    await asyncio.gather(*subscribers, return_exceptions=True)
+    if monitor_task:
+        monitor_task.cancel()
+
+    dropped = sum(max(len(expected - tags) - stats.rejected, 0) for tags in stats.received.values())
+    report = {
+        "subscribers": args.subscribers,
+        "subscriber_disconnects": stats.disconnects,
+        "uploads_sent": len(expected),
+        "elapsed_s": round(elapsed, 2),
+        "deliveries": sum(len(tags) for tags in stats.received.values()),
+        "dropped": dropped,
+        "error_messages": stats.errors,
+        "busy_messages": stats.busy,
+        "uploads_rejected": stats.rejected,
+        "fanout_latency_ms": {f"p{q}": round(percentile(stats.fanout_latencies, q) * 1000, 1) for q in (50, 90, 99)},
+        "e2e_latency_ms": {f"p{q}": round(percentile(stats.e2e_latencies, q) * 1000, 1) for q in (50, 90, 99)},
+    }
+    if server_metrics and "pipeline" in server_metrics:
+        report["server_pipeline"] = server_metrics["pipeline"]
+    if monitor and monitor.cpu_samples:
+        report["server_cpu_percent"] = {"mean": round(float(np.mean(monitor.cpu_samples)), 1),
+                                        "max": round(max(monitor.cpu_samples), 1)}
+        report["server_rss_mb"] = {"max": round(max(monitor.rss_samples), 1)}
+    return report
+
+
+def print_report(report):
+    print(f"Subscribers: {report['subscribers']} ({report['subscriber_disconnects']} failed/disconnected)")
+    print(f"Uploads sent: {report['uploads_sent']} in {report['elapsed_s']}s")
+    print(f"Deliveries: {report['deliveries']}, dropped: {report['dropped']}, "
+          f"errors: {report['error_messages']}")
+    print(f"Busy notices: {report['busy_messages']}, uploads rejected: {report['uploads_rejected']}")
+    if "server_pipeline" in report:
+        upload = report["server_pipeline"]["upload"]
+        print(f"Upload stage: high water {upload['high_water']}/{upload['maxsize']}, "
+              f"peak buffered {upload['peak_pending_bytes']} of {upload['max_pending_bytes']} bytes")
+    for key, label in (("fanout_latency_ms", "Fan-out latency"), ("e2e_latency_ms", "End-to-end latency")):
+        values = report[key]
+        print(f"{label} (ms): p50 {values['p50']}  p90 {values['p90']}  p99 {values['p99']}")
+    if "server_cpu_percent" in report:
+        print(f"Server CPU: mean {report['server_cpu_percent']['mean']}%  max {report['server_cpu_percent']['max']}%")
+        print(f"Server RSS: max {report['server_rss_mb']['max']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the subtitle WebSocket server.")
+    parser.add_argument("--uri", help="Server to test (default: the spawned server or ws://localhost:8768)")
+    parser.add_argument("--spawn", action="store_true", help="Start main.py with stub engines for the run")
+    parser.add_argument("--port", type=int, default=8769, help="Port for the spawned server")
+    parser.add_argument("--server-pid", type=int, help="PID of an already running server to monitor")
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--connect-rate", type=float, default=200, help="New subscriber connections per second (0 = all at once)")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--audio", help="WAV/PCM/m4a file to replay (default: synthetic audio)")
+    parser.add_argument("--clip-seconds", type=float, default=10.0, help="Use at most this much of the audio")
+    parser.add_argument("--chunk-seconds", type=float, default=0.0, help="Stream the audio as chunks of this length instead of one upload")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to real time")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Seconds to wait for in-flight subtitles")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-rss-mb", type=float, help="Exit non-zero if the server's peak RSS exceeds this")
+    args = parser.parse_args()
+
+    server = None
+    log_file = None
+    if args.spawn:
+        log_file = tempfile.NamedTemporaryFile(prefix="loadtest-server-", suffix=".log", delete=False)
+        server = spawn_server(args.port, log_file)
+        args.server_pid = server.pid
+        args.uri = args.uri or f"ws://localhost:{args.port}"
+        print(f"Spawned server (PID {server.pid}), log: {log_file.name}")
+        if not wait_for_port(args.port, timeout=120):
+            server.kill()
+            raise SystemExit("Spawned server did not start listening in time.")
+    args.uri = args.uri or "ws://localhost:8768"
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            log_file.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failures = []
+    if args.max_rss_mb and report.get("server_rss_mb", {}).get("max", 0) > args.max_rss_mb:
+        failures.append(f"server RSS {report['server_rss_mb']['max']} MB exceeds {args.max_rss_mb} MB")
+    if failures:
+        raise SystemExit("FAILED: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,42 +6,85 @@ import concurrent.futures
 import logging
 import io
 import os # Import os module
-import torch # Import torch
-from pydub import AudioSegment
+import uuid
+import socket
 from datetime import datetime, timezone
 
-from stt_engine import STTEngine
-from translate_engine import TranslationEngine
-from RealtimeSTT import AudioToTextRecorder
-
-# Force CPU usage for Torch and related libraries
-os.environ["CUDA_VISIBLE_DEVICES"] = ""
-
-# Force CPU usage for Torch and related libraries
-os.environ["CUDA_VISIBLE_DEVICES"] = ""
-torch.set_num_threads(1) # Limit Torch to single thread for CPU
-torch.set_default_device('cpu') # Explicitly set default device to CPU
+from segmenter import resegment, translate_segments
+from subtitle_history import SubtitleHistory
+from backpressure import (
+    BoundedStage, UploadAdmission, load_overload_policies,
+    UPLOAD_WORKERS, FINAL_QUEUE_SIZE, REALTIME_QUEUE_SIZE, BROADCAST_SEND_TIMEOUT_S,
+    MAX_MESSAGE_BYTES, MAX_INCOMING_MESSAGES,
+)
+from bus import create_bus, InProcessBus, SUBTITLES, EVENTS, CONTROL
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Initialize engines
-stt_engine = STTEngine()
-translation_engine = TranslationEngine()
+# Process role: "all" runs everything in one process; for scale-out, "fanout" nodes hold
+# the WebSocket clients and "worker" nodes run STT/translation, talking over BUS_URL
+BACKEND_ROLE = os.getenv("BACKEND_ROLE", "all")
+
+stt_engine = None
+translation_engine = None
+subtitle_history = None
+
+# Only workers need the inference stack, so fan-out nodes can scale without it
+if BACKEND_ROLE in ("all", "worker"):
+    # Force CPU usage for Torch and related libraries
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    import torch # Import torch
+    from stt_engine import STTEngine, segments_text, text_segments
+    from translate_engine import TranslationEngine
+    from RealtimeSTT import AudioToTextRecorder
+    from pydub import AudioSegment
+    torch.set_num_threads(1) # Limit Torch to single thread for CPU
+    torch.set_default_device('cpu') # Explicitly set default device to CPU
+
+    # Initialize engines
+    if os.getenv("STUB_ENGINES") == "1":
+        # Offline stand-ins used by loadtest.py
+        from stub_engines import StubSTTEngine, StubTranslationEngine
+        stt_engine = StubSTTEngine()
+        translation_engine = StubTranslationEngine()
+    else:
+        stt_engine = STTEngine()
+        translation_engine = TranslationEngine()
+
+if BACKEND_ROLE in ("all", "fanout"):
+    # Record of final subtitles for replay to late-joining clients and SRT/VTT export
+    subtitle_history = SubtitleHistory()
 
 # WebSocket endpoint
-WS_SERVER_PORT = 8768
+WS_SERVER_PORT = int(os.getenv("WS_SERVER_PORT", "8768"))
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+# Only one worker should own the microphone; in "all" mode that is this process
+LIVE_AUDIO_WORKER = BACKEND_ROLE == "all" or os.getenv("LIVE_AUDIO_WORKER") == "1"
+# Uploads a fan-out node keeps in flight across all workers (admission control stays here)
+WORKER_SLOTS = int(os.getenv("WORKER_SLOTS", str(UPLOAD_WORKERS)))
+JOB_TIMEOUT_S = 600.0  # Free a slot if its worker never reports back
+METRICS_INTERVAL_S = 5.0
+
+bus = None # Created in main()
 
 # Global variable to hold the main event loop
 _main_event_loop = None
 
-# Queues for inter-task communication
+# Bounded stages for inter-task communication; see backpressure.py for sizes and policies
 # audio_queue is no longer needed for live audio with RealtimeSTT
-subtitle_output_queue = asyncio.Queue()
-realtime_subtitle_queue = asyncio.Queue() # New queue for real-time subtitles
+overload_policies = load_overload_policies()
+subtitle_output_queue = BoundedStage("final", FINAL_QUEUE_SIZE, overload_policies["final"])
+realtime_subtitle_queue = BoundedStage("realtime", REALTIME_QUEUE_SIZE, overload_policies["realtime"]) # Stale partials are dropped first
+upload_admission = UploadAdmission(overload_policies["upload"], slots=WORKER_SLOTS)
+# Shared by all upload workers instead of a new pool per upload
+stt_executor = concurrent.futures.ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
 
 # Set of connected WebSocket clients
 connected_clients = set()
+pending_jobs = {} # job_id -> future resolved by the worker's job_done event
+worker_metrics = {} # worker id -> latest metrics it published
+upload_backlog = {} # fan-out id -> (uploads it has queued per worker, loop time of the report)
 live_audio_task = None
 realtime_stt_recorder = None # Global for RealtimeSTT recorder
 
@@ -54,7 +97,7 @@ async def register_client(websocket):
     logging.info(f"Client {websocket.remote_address} connected. Total clients: {len(connected_clients)}")
 
 async def unregister_client(websocket):
-    connected_clients.remove(websocket)
+    connected_clients.discard(websocket) # May already be gone if a broadcast dropped it
     logging.info(f"Client {websocket.remote_address} disconnected. Total clients: {len(connected_clients)}")
 
 async def send_subtitle_to_all_clients(data):
@@ -63,35 +106,50 @@ async def send_subtitle_to_all_clients(data):
         return
 
     message = json.dumps(data)
-    disconnected_clients = set()
-    for client in connected_clients:
-        try:
-            await client.send(message)
-        except websockets.exceptions.ConnectionClosed:
-            disconnected_clients.add(client)
-        except Exception as e:
-            logging.error(f"Error sending to client {client.remote_address}: {e}")
-            disconnected_clients.add(client)
-    
-    for client in disconnected_clients:
+    clients = list(connected_clients)
+    # Send to everyone concurrently so one slow display cannot hold up the rest
+    results = await asyncio.gather(
+        *[asyncio.wait_for(client.send(message), BROADCAST_SEND_TIMEOUT_S) for client in clients],
+        return_exceptions=True,
+    )
+    for client, result in zip(clients, results):
+        if not isinstance(result, BaseException):
+            continue
+        if isinstance(result, asyncio.TimeoutError):
+            logging.warning(f"Client {client.remote_address} too slow to receive subtitles, disconnecting.")
+            asyncio.create_task(client.close())
+        elif not isinstance(result, websockets.exceptions.ConnectionClosed):
+            logging.error(f"Error sending to client {client.remote_address}: {result}")
         if client in connected_clients:
             await unregister_client(client)
 
+async def broadcast(data):
+    # Every client-facing message goes through the bus so any fan-out node can deliver it
+    await bus.publish(SUBTITLES, data)
+
+async def relay_subtitles_to_clients():
+    async for data in bus.subscribe(SUBTITLES):
+        if data.get("type") == "final":
+            subtitle_history.append(data)
+        await send_subtitle_to_all_clients(data)
+
 async def process_subtitles_for_frontend():
     while True:
         # This queue will now receive final transcriptions from RealtimeSTT
-        hindi_text, english_text = await subtitle_output_queue.get()
+        hindi_text, english_text, segments = await subtitle_output_queue.get()
         if hindi_text or english_text:
             timestamp = datetime.now(timezone.utc).isoformat()
             logging.info(f"🎧 HINDI (Final): {hindi_text}")
             logging.info(f"🌐 ENGLISH (Final): {english_text}")
-            await send_subtitle_to_all_clients({
+            final_message = {
                 "timestamp": timestamp,
                 "hindi": hindi_text,
                 "english": english_text,
+                "segments": segments, # Per-segment start/end (seconds into the audio) and translation
                 "source": "mic",
                 "type": "final" # Indicate this is a final transcription
-            })
+            }
+            await broadcast(final_message)
         else:
             logging.info("Empty final subtitle received, not sending.")
         subtitle_output_queue.task_done()
@@ -104,7 +162,7 @@ async def process_realtime_subtitles_for_frontend():
             logging.debug(f"🎧 HINDI (Realtime): {realtime_text}") # Use debug for frequent updates
             # Translate real-time text if needed, or send as is
             # For now, sending as is, frontend can decide to display or not
-            await send_subtitle_to_all_clients({
+            await broadcast({
                 "timestamp": timestamp,
                 "hindi": realtime_text,
                 "english": translation_engine.translate(realtime_text), # Translate real-time text
@@ -144,14 +202,17 @@ async def start_realtime_stt_input(device_id=None):
             final_text, _ = realtime_stt_recorder.text()
             if final_text:
                 hindi_text = final_text
-                english_text = translation_engine.translate(hindi_text)
-                await subtitle_output_queue.put((hindi_text, english_text))
+                # RealtimeSTT only hands back text, so mic finals are split into untimed sentences.
+                # Its utterances already end on a pause, so nothing is held back to merge with the next one.
+                segments = resegment(text_segments(hindi_text))
+                english_text = translate_segments(segments, translation_engine)
+                await subtitle_output_queue.put((hindi_text, english_text, segments))
 
     except asyncio.CancelledError:
         logging.info("RealtimeSTT input task cancelled.")
     except Exception as e:
         logging.error(f"Error in RealtimeSTT input: {e}", exc_info=True)
-        await send_subtitle_to_all_clients({"hindi": "", "english": f"Error in STT: {e}", "type": "error"})
+        await broadcast({"hindi": "", "english": f"Error in STT: {e}", "type": "error"})
     finally:
         if realtime_stt_recorder:
             realtime_stt_recorder.shutdown()
@@ -159,12 +220,139 @@ async def start_realtime_stt_input(device_id=None):
             logging.info("RealtimeSTT recorder shut down.")
 
 def blocking_transcribe_and_translate(audio_data):
-    hindi_text = stt_engine.transcribe(audio_data)
+    segments = [segment for segment in stt_engine.transcribe(audio_data) if segment["text"]]
+    hindi_text = segments_text(segments)
     if not hindi_text.strip():
-        return "", "" # Return two empty strings if no transcription
-    
-    english_text = translation_engine.translate(hindi_text)
-    return hindi_text, english_text # Return the two values directly
+        return "", "", [] # Nothing to send if no transcription
+
+    # Translate whole sentences rather than whatever chunks the STT backend cut the audio into
+    segments = resegment(segments)
+    english_text = translate_segments(segments, translation_engine)
+    return hindi_text, english_text, segments
+
+async def dispatch_uploads():
+    # Fan-out side: hand admitted uploads to the workers one slot at a time
+    while True:
+        job = await upload_admission.next_job()
+        job_id = uuid.uuid4().hex
+        done = asyncio.get_running_loop().create_future()
+        pending_jobs[job_id] = done
+        try:
+            await bus.push_job(job_id, job[1])
+            await asyncio.wait_for(done, JOB_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logging.error(f"Upload job {job_id} timed out waiting for a worker.")
+        finally:
+            pending_jobs.pop(job_id, None)
+            upload_admission.job_done(job)
+
+async def track_worker_events():
+    async for event in bus.subscribe(EVENTS):
+        if event.get("type") == "job_done":
+            done = pending_jobs.get(event.get("job_id"))
+            if done and not done.done():
+                done.set_result(None)
+        elif event.get("type") == "metrics":
+            worker_metrics[event["worker"]] = event
+
+async def upload_worker():
+    # Worker side: run uploads pulled from the bus
+    while True:
+        job_id, audio_bytes_data = await bus.pull_job()
+        try:
+            await process_uploaded_audio_data(audio_bytes_data)
+        finally:
+            await bus.publish(EVENTS, {"type": "job_done", "job_id": job_id, "worker": WORKER_ID})
+
+async def publish_worker_metrics():
+    while True:
+        await bus.publish(EVENTS, {
+            "type": "metrics",
+            "worker": WORKER_ID,
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "stt": stt_engine.metrics(),
+            "translation": translation_engine.metrics(),
+            "final": subtitle_output_queue.metrics(),
+            "realtime": realtime_subtitle_queue.metrics(),
+        })
+        await asyncio.sleep(METRICS_INTERVAL_S)
+
+async def publish_upload_backlog():
+    # Fan-out side: queued uploads never reach the workers' STT engines until dispatched, so
+    # tell the workers how deep the queue is for the Whisper controller's backlog signal
+    while True:
+        workers = max(len(worker_metrics), 1)
+        await bus.publish(CONTROL, {
+            "type": "upload_backlog",
+            "fanout": WORKER_ID,
+            "queued_per_worker": -(-upload_admission.stage.qsize() // workers),
+        })
+        await asyncio.sleep(METRICS_INTERVAL_S)
+
+async def track_upload_backlog():
+    async for command in bus.subscribe(CONTROL):
+        if command.get("type") == "upload_backlog":
+            upload_backlog[command["fanout"]] = (command["queued_per_worker"], asyncio.get_running_loop().time())
+
+def reported_upload_backlog():
+    # Reports from a fan-out node that has gone quiet are ignored
+    cutoff = _main_event_loop.time() - 3 * METRICS_INTERVAL_S
+    return sum(queued for queued, reported in list(upload_backlog.values()) if reported >= cutoff)
+
+def watch_upload_queue():
+    controller = getattr(stt_engine, "whisper_controller", None)
+    if controller is None:
+        return # Stub engines have no Whisper to adapt
+    if BACKEND_ROLE == "all":
+        controller.queue_depth = upload_admission.stage.qsize
+    else:
+        controller.queue_depth = reported_upload_backlog
+        asyncio.create_task(track_upload_backlog())
+
+async def handle_live_audio_commands():
+    global live_audio_task
+    async for command in bus.subscribe(CONTROL):
+        if command.get("type") == "start_live_audio":
+            if live_audio_task:
+                live_audio_task.cancel() # Cancel existing task if any
+                await live_audio_task # Wait for it to finish cancelling
+            device_id = command.get("device")
+            logging.info(f"Received 'start_live_audio' command for device {device_id}. Starting RealtimeSTT.")
+            live_audio_task = asyncio.create_task(start_realtime_stt_input(device_id))
+            await broadcast({"hindi": "", "english": "Live audio input started with RealtimeSTT.", "type": "status"})
+        elif command.get("type") == "stop_live_audio":
+            if live_audio_task:
+                live_audio_task.cancel()
+                await live_audio_task
+                live_audio_task = None
+            await broadcast({"hindi": "", "english": "Live audio input stopped.", "type": "status"})
+
+async def admit_upload(websocket, audio_bytes_data):
+    position, evicted = await upload_admission.submit(websocket, audio_bytes_data)
+    if evicted is not None:
+        await send_busy(evicted[0], None)
+    if position is None:
+        logging.warning(f"Upload of {len(audio_bytes_data)} bytes rejected, pipeline is full.")
+        await send_busy(websocket, None)
+    elif position > 0:
+        await send_busy(websocket, position)
+
+async def send_busy(websocket, position):
+    if position is None:
+        text = "Server busy, upload rejected. Please try again later."
+    else:
+        text = f"Server busy, upload queued at position {position}."
+    try:
+        await websocket.send(json.dumps({"hindi": "", "english": text, "type": "busy", "position": position}))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+def pipeline_metrics():
+    # Final/realtime stages live on the workers and are reported per worker
+    return {
+        "upload": upload_admission.metrics(),
+        "clients": len(connected_clients),
+    }
 
 async def process_uploaded_audio_data(audio_bytes_data):
     try:
@@ -174,26 +362,25 @@ async def process_uploaded_audio_data(audio_bytes_data):
         total_length_ms = len(audio_segment)
         logging.info(f"Processing uploaded audio (Duration: {total_length_ms / 1000}s)")
 
-        await send_subtitle_to_all_clients({"hindi": "", "english": "Processing uploaded audio...", "type": "status"})
+        await broadcast({"hindi": "", "english": "Processing uploaded audio...", "type": "status"})
 
         # For uploaded audio, we can still use the existing STTEngine for batch processing
         # or feed it to RealtimeSTT if it supports feeding raw bytes directly for non-mic input.
         # For simplicity, let's keep the existing batch processing for uploaded files for now.
         loop = asyncio.get_running_loop()
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            hindi_text, english_text = await loop.run_in_executor(
-                pool,
-                blocking_transcribe_and_translate,
-                audio_segment.raw_data # Pass raw audio data for transcription
-            )
-            await subtitle_output_queue.put((hindi_text, english_text))
-        
+        hindi_text, english_text, segments = await loop.run_in_executor(
+            stt_executor,
+            blocking_transcribe_and_translate,
+            audio_segment.raw_data # Pass raw audio data for transcription
+        )
+        await subtitle_output_queue.put((hindi_text, english_text, segments))
+
         logging.info("Finished processing uploaded audio.")
-        await send_subtitle_to_all_clients({"hindi": "", "english": "Finished processing audio.", "type": "status"})
+        await broadcast({"hindi": "", "english": "Finished processing audio.", "type": "status"})
 
     except Exception as e:
         logging.error(f"Error processing uploaded audio: {e}")
-        await send_subtitle_to_all_clients({"hindi": "", "english": f"Error: {e}", "type": "error"})
+        await broadcast({"hindi": "", "english": f"Error: {e}", "type": "error"})
 
 async def websocket_handler(websocket):
     await register_client(websocket)
@@ -202,48 +389,75 @@ async def websocket_handler(websocket):
             if isinstance(message, str):
                 try:
                     control_message = json.loads(message)
-                    if control_message.get("type") == "start_live_audio":
-                        global live_audio_task
-                        if live_audio_task:
-                            live_audio_task.cancel() # Cancel existing task if any
-                            await live_audio_task # Wait for it to finish cancelling
-                        device_id = control_message.get("device")
-                        logging.info(f"Received 'start_live_audio' command for device {device_id}. Starting RealtimeSTT.")
-                        live_audio_task = asyncio.create_task(start_realtime_stt_input(device_id))
-                        await send_subtitle_to_all_clients({"hindi": "", "english": "Live audio input started with RealtimeSTT.", "type": "status"})
-                    elif control_message.get("type") == "stop_live_audio": # Add a stop command
-                        if live_audio_task:
-                            live_audio_task.cancel()
-                            await live_audio_task
-                            live_audio_task = None
-                        await send_subtitle_to_all_clients({"hindi": "", "english": "Live audio input stopped.", "type": "status"})
+                    if control_message.get("type") in ("start_live_audio", "stop_live_audio"):
+                        # Forwarded to the worker that owns the microphone
+                        await bus.publish(CONTROL, control_message)
+                    elif control_message.get("type") == "get_metrics":
+                        await websocket.send(json.dumps({"type": "metrics", "pipeline": pipeline_metrics(), "workers": worker_metrics}))
+                    elif control_message.get("type") == "history_request":
+                        # Replay only to the requesting client, as one batched message
+                        try:
+                            replay = subtitle_history.replay_message(control_message)
+                        except (TypeError, ValueError) as e:
+                            logging.warning(f"Invalid history request {control_message}: {e}")
+                            replay = {"hindi": "", "english": f"Invalid history request: {e}", "type": "error"}
+                        await websocket.send(json.dumps(replay))
                 except json.JSONDecodeError:
                     logging.warning(f"Received non-JSON message: {message}")
             elif isinstance(message, bytes):
                 logging.info(f"Received binary audio data of size: {len(message)} bytes")
-                asyncio.create_task(process_uploaded_audio_data(message))
+                await admit_upload(websocket, message)
     except websockets.exceptions.ConnectionClosed:
         logging.info(f"Client {websocket.remote_address} disconnected.")
     finally:
         await unregister_client(websocket)
-        # If this was the last client and live audio is running, consider stopping it
-        if not connected_clients and live_audio_task:
-            live_audio_task.cancel()
-            await live_audio_task
-            live_audio_task = None
+        # If this was the last client and live audio is running, consider stopping it.
+        # Other fan-out nodes may still have clients, so only the single-process mode does this.
+        if not connected_clients and BACKEND_ROLE == "all" and live_audio_task:
+            await bus.publish(CONTROL, {"type": "stop_live_audio"})
 
 async def main():
-    global _main_event_loop
+    global _main_event_loop, bus
     _main_event_loop = asyncio.get_running_loop()
+    if BACKEND_ROLE not in ("all", "fanout", "worker"):
+        raise ValueError(f"Unknown BACKEND_ROLE: {BACKEND_ROLE}")
+    bus = create_bus()
+    if BACKEND_ROLE != "all" and isinstance(bus, InProcessBus):
+        logging.warning(f"BACKEND_ROLE={BACKEND_ROLE} with an in-process bus cannot reach other processes; set BUS_URL.")
+    logging.info(f"Starting backend as '{BACKEND_ROLE}' ({WORKER_ID}) on bus {type(bus).__name__}")
 
-    # Start workers for processing subtitles
-    asyncio.create_task(process_subtitles_for_frontend())
-    asyncio.create_task(process_realtime_subtitles_for_frontend()) # New worker for real-time subtitles
-    
-    server = await websockets.serve(websocket_handler, "0.0.0.0", WS_SERVER_PORT)
-    logging.info(f"🌐 WebSocket Server running at ws://localhost:{WS_SERVER_PORT}")
+    # Fan-out tasks first so their subscriptions exist before workers publish
+    if BACKEND_ROLE in ("all", "fanout"):
+        asyncio.create_task(relay_subtitles_to_clients())
+        asyncio.create_task(track_worker_events())
+        for _ in range(WORKER_SLOTS):
+            asyncio.create_task(dispatch_uploads())
+        if BACKEND_ROLE == "fanout":
+            asyncio.create_task(publish_upload_backlog())
 
-    await server.wait_closed()
+    if BACKEND_ROLE in ("all", "worker"):
+        # Start workers for processing subtitles
+        asyncio.create_task(process_subtitles_for_frontend())
+        asyncio.create_task(process_realtime_subtitles_for_frontend()) # New worker for real-time subtitles
+        asyncio.create_task(publish_worker_metrics())
+        watch_upload_queue()
+        for _ in range(UPLOAD_WORKERS):
+            asyncio.create_task(upload_worker())
+        if LIVE_AUDIO_WORKER:
+            asyncio.create_task(handle_live_audio_commands())
+
+    try:
+        if BACKEND_ROLE == "worker":
+            await asyncio.Event().wait() # Workers have no server; run until killed
+        else:
+            server = await websockets.serve(
+                websocket_handler, "0.0.0.0", WS_SERVER_PORT,
+                max_size=MAX_MESSAGE_BYTES, max_queue=MAX_INCOMING_MESSAGES,
+            )
+            logging.info(f"🌐 WebSocket Server running at ws://localhost:{WS_SERVER_PORT}")
+            await server.wait_closed()
+    finally:
+        await bus.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,121 @@
+import re
+
+# Re-split STT output into sentences before translation. Hindi ends sentences with the
+# danda (।), double danda (॥), "?" and "!"; "." shows up in romanised and mixed text.
+SENTENCE_END = re.compile(r"(?<=[।॥?!.])\s+")
+SENTENCE_END_CHARS = "।॥?!."
+PAUSE_SPLIT_S = 0.8  # A gap this long between segments is a sentence boundary even without punctuation
+MAX_SENTENCE_CHARS = 200  # Stop merging fragments past this; long inputs hurt MarianMT quality
+
+# Length bucketing for padded batch translation
+MAX_BATCH_SIZE = 16
+BUCKET_LENGTH_RATIO = 1.5  # Longest text in a batch is at most this much longer than the shortest
+BUCKET_MIN_SPREAD = 20  # ...or this many characters, so short texts are not split needlessly
+
+
+def _split_segment(segment):
+    """Splits one STT segment on sentence punctuation, sharing out its time span."""
+    pieces = [piece.strip() for piece in SENTENCE_END.split(segment["text"]) if piece.strip()]
+    if len(pieces) <= 1:
+        return [dict(segment)]
+    result = _split_pieces(segment, pieces)
+    if segment.get("boundary"):
+        result[-1]["boundary"] = True
+    return result
+
+
+def _split_pieces(segment, pieces):
+    start, end = segment.get("start"), segment.get("end")
+    words = segment.get("words")
+    word_counts = [len(piece.split()) for piece in pieces]
+    result = []
+    if words and sum(word_counts) == len(words):
+        # Word timings line up with the text, so cut exactly at the word boundaries
+        offset = 0
+        for piece, count in zip(pieces, word_counts):
+            piece_words = words[offset:offset + count]
+            offset += count
+            result.append({"start": piece_words[0]["start"], "end": piece_words[-1]["end"], "text": piece,
+                           "confidence": segment.get("confidence"), "words": piece_words})
+        return result
+    total_chars = sum(len(piece) for piece in pieces)
+    cursor = start
+    for piece in pieces:
+        piece_end = None
+        if start is not None and end is not None:
+            piece_end = round(cursor + (end - start) * len(piece) / total_chars, 3)
+        result.append({"start": cursor, "end": piece_end, "text": piece, "confidence": segment.get("confidence")})
+        cursor = piece_end
+    return result
+
+
+def _should_merge(current, following):
+    if current["text"][-1] in SENTENCE_END_CHARS or current.get("boundary"):
+        return False
+    if len(current["text"]) + 1 + len(following["text"]) > MAX_SENTENCE_CHARS:
+        return False
+    if current.get("end") is not None and following.get("start") is not None:
+        return following["start"] - current["end"] < PAUSE_SPLIT_S
+    return True
+
+
+def _merge(current, following):
+    merged = {
+        "start": current.get("start"),
+        "end": following.get("end") if following.get("end") is not None else current.get("end"),
+        "text": f"{current['text']} {following['text']}",
+    }
+    confidences = [c for c in (current.get("confidence"), following.get("confidence")) if c is not None]
+    merged["confidence"] = min(confidences) if confidences else None
+    if "words" in current and "words" in following:
+        merged["words"] = current["words"] + following["words"]
+    if following.get("boundary"):
+        merged["boundary"] = True
+    return merged
+
+
+def resegment(segments):
+    """Turns STT segments into sentence-sized segments, keeping their timing.
+
+    Segments holding several sentences are split on sentence punctuation; fragments
+    without closing punctuation are joined to what follows unless a pause of at
+    least PAUSE_SPLIT_S, a "boundary" segment end or MAX_SENTENCE_CHARS gets in the way.
+    """
+    pieces = [piece for segment in segments if segment.get("text") for piece in _split_segment(segment)]
+    sentences = []
+    for piece in pieces:
+        if sentences and _should_merge(sentences[-1], piece):
+            sentences[-1] = _merge(sentences[-1], piece)
+        else:
+            sentences.append(piece)
+    for sentence in sentences:
+        sentence.pop("boundary", None) # Only meaningful between STT and here
+    return sentences
+
+
+def translate_segments(segments, translation_engine):
+    """Translates segments in one batched call, storing each translation on its segment.
+
+    Returns the joined English text. A segment left without a translation (a short
+    reply from the backend) gets an empty one rather than a neighbour's.
+    """
+    english_texts = translation_engine.translate_batch([segment["text"] for segment in segments])
+    for index, segment in enumerate(segments):
+        segment["english"] = english_texts[index] if index < len(english_texts) else ""
+    return " ".join(english for english in english_texts if english)
+
+
+def length_buckets(texts, max_batch=MAX_BATCH_SIZE):
+    """Groups indices of texts into batches of similar length, so padding stays small."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches = []
+    for index in order:
+        length = len(texts[index])
+        if batches:
+            batch = batches[-1]
+            shortest = len(texts[batch[0]])
+            if len(batch) < max_batch and length <= max(shortest * BUCKET_LENGTH_RATIO, shortest + BUCKET_MIN_SPREAD):
+                batch.append(index)
+                continue
+        batches.append([index])
+    return batches
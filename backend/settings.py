@@ -0,0 +1,14 @@
+import json
+import logging
+
+# Same relative convention as config/.env: the backend runs from backend/
+SETTINGS_PATH = "../config/settings.json"
+
+
+def load_settings(settings_path=SETTINGS_PATH) -> dict:
+    try:
+        with open(settings_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read settings from {settings_path}: {e}. Using defaults.")
+        return {}
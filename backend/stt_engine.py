@@ -1,15 +1,52 @@
 import os
+import time
 import logging
+import threading
+import collections
 from dotenv import load_dotenv
 from google.cloud import speech
 import torch
 from faster_whisper import WhisperModel
 import numpy as np
 
+from whisper_controller import AdaptiveWhisperController
+from engine_strategy import EngineSelector, EngineCancelled
+from settings import load_settings
+
 load_dotenv(dotenv_path='../config/.env')
 
+# Per-word timings. Segment start/end come free with every decode; words cost Whisper an extra alignment pass
+WORD_TIMESTAMPS = os.getenv("STT_WORD_TIMESTAMPS", "0") == "1"
+
+# Transcripts are lists of segment dicts:
+#   {"start": 0.0, "end": 2.4, "text": "...", "confidence": 0.82,
+#    "words": [{"start": 0.0, "end": 0.3, "word": "...", "probability": 0.9}, ...]}
+# Times are seconds from the start of the audio; "words" is only present with WORD_TIMESTAMPS.
+# "boundary": True marks a segment the backend ended at an utterance break it detected but
+# whose gap the times cannot show (Google results without word offsets run back to back).
+
+def segments_text(segments) -> str:
+    return " ".join(segment["text"] for segment in segments if segment["text"])
+
+def text_segments(text, duration=None) -> list:
+    """Wraps untimed text (e.g. from RealtimeSTT) in the segment format."""
+    text = text.strip()
+    if not text:
+        return []
+    return [{"start": 0.0 if duration is not None else None, "end": duration, "text": text, "confidence": None}]
+
+def _seconds(offset) -> float:
+    # proto-plus exposes Durations as timedelta
+    return round(offset.total_seconds(), 3) if offset is not None else 0.0
+
+# Backends in preference order; the last one is local and the fallback for the others
+STT_BACKENDS = ("google", "whisper")
+BYTES_PER_AUDIO_SECOND = 16000 * 2  # 16 kHz mono LINEAR16
+MAX_CACHED_WHISPER_MODELS = 2  # Current model size plus the previous one
+GOOGLE_STT_TIMEOUT_S = 60.0  # Sync recognize handles up to a minute of audio
+
 class STTEngine:
-    def __init__(self, language_code="hi-IN"):
+    def __init__(self, language_code="hi-IN", settings=None):
         self.language_code = language_code
         self.google_api_key = os.getenv("GOOGLE_API_KEY")
         if self.google_api_key and self.google_api_key != "your_google_api_key":
@@ -17,47 +54,126 @@ class STTEngine:
         else:
             logging.warning("Google API key not found or is a placeholder. Google STT will not work.")
             self.client = None
-        self._whisper_model = None
-
-    @property
-    def whisper_model(self):
-        if self._whisper_model is None:
-            logging.info("Loading Whisper model for fallback (CPU only)...")
-            device = "cpu" # Force CPU usage for PyInstaller compatibility
-            self._whisper_model = WhisperModel("small", device=device, compute_type="int8")
-            logging.info("Whisper model loaded (CPU).")
-        return self._whisper_model
-
-    def transcribe_google(self, audio_data: bytes) -> str:
+        self._whisper_models = collections.OrderedDict() # Loaded on demand, least recently used first
+        self._whisper_load_lock = threading.Lock()
+        self.whisper_controller = AdaptiveWhisperController()
+
+        settings = settings if settings is not None else load_settings()
+        primary = settings.get("stt_engine", "google")
+        if primary not in STT_BACKENDS:
+            logging.warning(f"Unknown stt_engine '{primary}' in settings, using google.")
+            primary = "google"
+        if primary == "google" and not self.client:
+            primary = "whisper"
+        self.selector = EngineSelector(
+            "STT",
+            {"google": self.transcribe_google, "whisper": self.transcribe_whisper},
+            primary,
+            fallback="whisper",
+            strategy=settings.get("stt_strategy", "fallback"),
+            is_usable=lambda segments: bool(segments_text(segments)),
+            job_size=lambda audio_data: len(audio_data) / BYTES_PER_AUDIO_SECOND,
+        )
+
+    def get_whisper_model(self, model_size):
+        with self._whisper_load_lock:
+            if model_size not in self._whisper_models:
+                logging.info(f"Loading Whisper {model_size} model for fallback (CPU only)...")
+                device = "cpu" # Force CPU usage for PyInstaller compatibility
+                self._whisper_models[model_size] = WhisperModel(model_size, device=device, compute_type="int8")
+                logging.info(f"Whisper {model_size} model loaded (CPU).")
+            self._whisper_models.move_to_end(model_size)
+            # Keep the current size and the one we came from (for a quick shift back); jobs
+            # still running on an evicted model hold their own reference until they finish
+            while len(self._whisper_models) > MAX_CACHED_WHISPER_MODELS:
+                evicted, _ = self._whisper_models.popitem(last=False)
+                logging.info(f"Unloaded Whisper {evicted} model.")
+            return self._whisper_models[model_size]
+
+    def transcribe_google(self, audio_data: bytes, cancel=None) -> list:
+        # A sync recognize call cannot be interrupted; a cancelled result is simply discarded
         logging.info("Transcribing with Google STT...")
         audio = speech.RecognitionAudio(content=audio_data)
         config = speech.RecognitionConfig(
             encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
             sample_rate_hertz=16000,
             language_code=self.language_code,
+            enable_word_time_offsets=WORD_TIMESTAMPS,
+            enable_automatic_punctuation=True, # Gives the segmenter dandas and question marks to split on
         )
-        response = self.client.recognize(config=config, audio=audio)
-        if response.results and response.results[0].alternatives:
-            return response.results[0].alternatives[0].transcript
-        return ""
+        response = self.client.recognize(config=config, audio=audio, timeout=GOOGLE_STT_TIMEOUT_S)
+        # Each result covers the audio up to its result_end_time, following the previous one
+        segments = []
+        previous_end = 0.0
+        for result in response.results:
+            if not result.alternatives:
+                continue
+            alternative = result.alternatives[0]
+            end = _seconds(result.result_end_time) or previous_end
+            segment = {
+                "start": previous_end,
+                "end": end,
+                "text": alternative.transcript.strip(),
+                "confidence": round(alternative.confidence, 3) if alternative.confidence else None,
+            }
+            if WORD_TIMESTAMPS:
+                segment["words"] = [
+                    {"start": _seconds(word.start_time), "end": _seconds(word.end_time), "word": word.word, "probability": None}
+                    for word in alternative.words
+                ]
+                if segment["words"]:
+                    segment["start"] = segment["words"][0]["start"]
+            if not segment.get("words"):
+                segment["boundary"] = True # Result ends are Google's own breaks; keep them
+            segments.append(segment)
+            previous_end = end
+        return segments
 
-    def transcribe_whisper(self, audio_data: bytes) -> str:
-        logging.info("Transcribing with Whisper STT...")
+    def transcribe_whisper(self, audio_data: bytes, cancel=None) -> list:
+        model_size, beam_size = self.whisper_controller.settings
+        logging.info(f"Transcribing with Whisper STT ({model_size}, beam {beam_size})...")
         audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-        segments, _ = self.whisper_model.transcribe(audio_np, beam_size=5, language="hi")
-        return " ".join([segment.text for segment in segments])
-
-    def transcribe(self, audio_data: bytes) -> str:
-        if self.client:
-            try:
-                transcript = self.transcribe_google(audio_data)
-                if transcript:
-                    logging.info("Google STT successful.")
-                    return transcript
-                else:
-                    raise ValueError("Empty transcript from Google")
-            except Exception as e:
-                logging.warning(f"Google STT failed: {e}. Falling back to Whisper.")
-                return self.transcribe_whisper(audio_data)
-        else:
-            return self.transcribe_whisper(audio_data)
\ No newline at end of file
+        # Loading (or downloading) a model is not decoding; keep it out of the RTF
+        model = self.get_whisper_model(model_size)
+        self.whisper_controller.job_started()
+        started = time.monotonic()
+        audio_seconds = 0.0
+        try:
+            segments, _ = model.transcribe(
+                audio_np, beam_size=beam_size, language="hi", word_timestamps=WORD_TIMESTAMPS
+            )
+            # segments is a lazy generator; decoding happens while it is consumed, so a
+            # hedged call that lost can stop between segments
+            result = []
+            for segment in segments:
+                if cancel is not None and cancel.is_set():
+                    raise EngineCancelled("Whisper transcription cancelled")
+                result.append(self._whisper_segment(segment))
+            audio_seconds = len(audio_np) / 16000
+            return result
+        finally:
+            self.whisper_controller.job_finished(audio_seconds, time.monotonic() - started)
+
+    @staticmethod
+    def _whisper_segment(segment) -> dict:
+        result = {
+            "start": round(segment.start, 3),
+            "end": round(segment.end, 3),
+            "text": segment.text.strip(),
+            # avg_logprob is the decoder's own score for the segment; exp() maps it to 0..1
+            "confidence": round(float(np.exp(segment.avg_logprob)), 3),
+        }
+        if segment.words is not None:
+            result["words"] = [
+                {"start": round(word.start, 3), "end": round(word.end, 3), "word": word.word.strip(), "probability": round(word.probability, 3)}
+                for word in segment.words
+            ]
+        return result
+
+    def metrics(self) -> dict:
+        metrics = self.whisper_controller.metrics()
+        metrics["selector"] = self.selector.metrics()
+        return metrics
+
+    def transcribe(self, audio_data: bytes) -> list:
+        return self.selector.run(audio_data)
@@ -0,0 +1,66 @@
+import os
+import re
+import time
+import zlib
+import logging
+
+# Stand-ins for STTEngine/TranslationEngine so the server can be load-tested offline.
+# Enabled by starting main.py with STUB_ENGINES=1 (loadtest.py --spawn does this).
+STUB_STT_RTF = float(os.getenv("STUB_STT_RTF", "0.1"))  # Seconds of work per second of audio
+STUB_TRANSLATE_LATENCY_MS = float(os.getenv("STUB_TRANSLATE_LATENCY_MS", "50"))
+STUB_CPU_BOUND = os.getenv("STUB_CPU_BOUND", "0") == "1"  # Spin instead of sleep to mimic local models
+
+BYTES_PER_SECOND = 16000 * 2  # 16 kHz mono int16, as produced by process_uploaded_audio_data
+
+TAG_PATTERN = re.compile(r"#([0-9a-f]{8})")
+
+
+def audio_tag(audio_data: bytes) -> str:
+    """Fingerprint echoed back in the transcript so clients can match results to uploads."""
+    return f"{zlib.crc32(audio_data) & 0xffffffff:08x}"
+
+
+def _work(seconds: float):
+    if seconds <= 0:
+        return
+    if STUB_CPU_BOUND:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+    else:
+        time.sleep(seconds)
+
+
+class StubSTTEngine:
+    def __init__(self, language_code="hi-IN"):
+        self.language_code = language_code
+        logging.warning(f"Using stub STT engine (RTF {STUB_STT_RTF}, CPU bound: {STUB_CPU_BOUND}).")
+
+    def transcribe(self, audio_data: bytes) -> list:
+        duration = len(audio_data) / BYTES_PER_SECOND
+        _work(duration * STUB_STT_RTF)
+        return [{"start": 0.0, "end": round(duration, 3), "text": f"परीक्षण वाक्य #{audio_tag(audio_data)}", "confidence": 1.0}]
+
+    def metrics(self) -> dict:
+        return {"stub_stt_rtf": STUB_STT_RTF}
+
+
+class StubTranslationEngine:
+    def __init__(self):
+        logging.warning(f"Using stub translation engine ({STUB_TRANSLATE_LATENCY_MS} ms per call).")
+
+    def translate(self, hindi_text: str) -> str:
+        _work(STUB_TRANSLATE_LATENCY_MS / 1000)
+        return self._tagged(hindi_text)
+
+    def translate_batch(self, hindi_texts: list) -> list:
+        _work(STUB_TRANSLATE_LATENCY_MS / 1000)  # One round trip per batch, like DeepL
+        return [self._tagged(text) for text in hindi_texts]
+
+    def metrics(self) -> dict:
+        return {"stub_translate_latency_ms": STUB_TRANSLATE_LATENCY_MS}
+
+    @staticmethod
+    def _tagged(hindi_text):
+        match = TAG_PATTERN.search(hindi_text)
+        return f"Test sentence #{match.group(1)}" if match else "Test sentence"
@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import bisect
+import logging
+import argparse
+from datetime import datetime, timezone
+
+# Where per-session subtitle logs are written (relative to backend/, like config/.env)
+HISTORY_DIR = os.getenv("SUBTITLE_HISTORY_DIR", "../logs/history")
+HISTORY_RING_SIZE = 500  # Final subtitles kept in memory for replay
+MAX_REPLAY_LINES = 200  # Upper bound for a single "last N" request
+DEFAULT_CUE_SECONDS = 4.0  # Display time for the last cue of an export
+
+
+def _to_epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class SubtitleHistory:
+    """Append-only record of final subtitles for one session.
+
+    Recent entries live in an in-memory ring ordered by timestamp so late-joining
+    clients can be replayed with a bisect; every entry is also appended to a JSONL
+    log on disk that the SRT/VTT exporters stream from.
+    """
+
+    def __init__(self, session_id=None, history_dir=HISTORY_DIR, ring_size=HISTORY_RING_SIZE):
+        self.session_id = session_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.ring_size = ring_size
+        # Parallel lists; _start marks the oldest live slot, compacted lazily
+        self._entries = []
+        self._times = []
+        self._start = 0
+        self.log_path = None
+        self._log_file = None
+        if history_dir:
+            try:
+                os.makedirs(history_dir, exist_ok=True)
+                self.log_path = os.path.join(history_dir, f"{self.session_id}.jsonl")
+                self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                logging.info(f"Subtitle history for session {self.session_id} logged to {self.log_path}")
+            except OSError as e:
+                logging.warning(f"Could not open subtitle history log in {history_dir}: {e}. Keeping history in memory only.")
+                self.log_path = None
+
+    def __len__(self):
+        return len(self._entries) - self._start
+
+    def append(self, entry: dict):
+        epoch = _to_epoch(entry["timestamp"])
+        if self._times and epoch < self._times[-1]:
+            epoch = self._times[-1]  # Keep the index monotonic if clocks step backwards
+        self._entries.append(entry)
+        self._times.append(epoch)
+        if len(self) > self.ring_size:
+            self._start += 1
+            if self._start >= self.ring_size:
+                del self._entries[:self._start]
+                del self._times[:self._start]
+                self._start = 0
+        if self._log_file:
+            try:
+                self._log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logging.error(f"Failed to write subtitle history entry: {e}")
+
+    def last(self, n: int) -> list:
+        n = max(0, min(int(n), MAX_REPLAY_LINES, len(self)))
+        if n == 0:
+            return []
+        return self._entries[len(self._entries) - n:]
+
+    def since(self, timestamp) -> list:
+        index = bisect.bisect_right(self._times, _to_epoch(timestamp), lo=self._start)
+        return self._entries[index:index + MAX_REPLAY_LINES]
+
+    def replay_message(self, request: dict) -> dict:
+        """Builds the single batched reply to a client's history request."""
+        if request.get("since") is not None:
+            entries = self.since(request["since"])
+        else:
+            entries = self.last(request.get("last", MAX_REPLAY_LINES))
+        return {
+            "type": "history",
+            "session": self.session_id,
+            "entries": entries,
+        }
+
+    def close(self):
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+
+def iter_log(log_path):
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _format_cue_time(seconds: float, separator: str) -> str:
+    millis = int(round(max(seconds, 0.0) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _iter_timed(entries):
+    # Finals with timed segments become one cue per segment, offset from the final's timestamp
+    for entry in entries:
+        start = _to_epoch(entry["timestamp"])
+        timed = [segment for segment in entry.get("segments") or [] if segment.get("start") is not None]
+        if len(timed) < 2:
+            yield start, None, entry
+            continue
+        for segment in timed:
+            end = start + segment["end"] if segment.get("end") is not None else None
+            yield start + segment["start"], end, {"hindi": segment["text"], "english": segment.get("english", "")}
+
+
+def _iter_cues(entries):
+    # One cue of lookahead: a cue ends at its own end time or when the next one starts
+    origin = None
+    previous = None
+    for start, natural_end, entry in _iter_timed(entries):
+        if origin is None:
+            origin = start
+        if previous is not None:
+            yield _finish_cue(previous, start, origin)
+        previous = (start, natural_end, entry)
+    if previous is not None:
+        yield _finish_cue(previous, None, origin)
+
+
+def _finish_cue(cue, next_start, origin):
+    start, natural_end, entry = cue
+    end = natural_end if natural_end is not None else start + DEFAULT_CUE_SECONDS
+    if next_start is not None and next_start > start:
+        end = min(end, next_start)
+    end = max(end, start + 0.5)  # Always leave the cue on screen briefly
+    return start - origin, end - origin, entry
+
+
+def _cue_text(entry, include_hindi):
+    lines = []
+    if include_hindi and entry.get("hindi"):
+        lines.append(entry["hindi"])
+    if entry.get("english"):
+        lines.append(entry["english"])
+    return "\n".join(lines)
+
+
+def iter_srt(log_path, include_hindi=True):
+    for index, (start, end, entry) in enumerate(_iter_cues(iter_log(log_path)), start=1):
+        yield f"{index}\n{_format_cue_time(start, ',')} --> {_format_cue_time(end, ',')}\n{_cue_text(entry, include_hindi)}\n\n"
+
+
+def iter_vtt(log_path, include_hindi=True):
+    yield "WEBVTT\n\n"
+    for start, end, entry in _iter_cues(iter_log(log_path)):
+        yield f"{_format_cue_time(start, '.')} --> {_format_cue_time(end, '.')}\n{_cue_text(entry, include_hindi)}\n\n"
+
+
+def export(log_path, out, fmt="srt", include_hindi=True):
+    chunks = iter_vtt(log_path, include_hindi) if fmt == "vtt" else iter_srt(log_path, include_hindi)
+    for chunk in chunks:
+        out.write(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a subtitle history log to SRT or WebVTT.")
+    parser.add_argument("log_path", help="Session log written by the backend (JSONL)")
+    parser.add_argument("--format", choices=["srt", "vtt"], default="srt")
+    parser.add_argument("--english-only", action="store_true", help="Omit the Hindi line from each cue")
+    parser.add_argument("-o", "--output", help="Output file (defaults to stdout)")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            export(args.log_path, out, args.format, not args.english_only)
+    else:
+        export(args.log_path, sys.stdout, args.format, not args.english_only)
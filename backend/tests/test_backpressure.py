@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from backpressure import BoundedStage, UploadAdmission
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_drop_newest_refuses_items_when_full():
+    async def scenario():
+        stage = BoundedStage("test", 2, "drop_newest")
+        results = [await stage.put(item) for item in "abc"]
+        return stage, results, [stage.queue.get_nowait() for _ in range(stage.qsize())]
+
+    stage, results, remaining = run(scenario())
+    assert results == [(True, None), (True, None), (False, None)]
+    assert remaining == ["a", "b"]
+    assert stage.metrics()["dropped"] == 1
+    assert stage.metrics()["accepted"] == 2
+
+
+def test_drop_oldest_evicts_head_to_make_room():
+    async def scenario():
+        stage = BoundedStage("test", 2, "drop_oldest")
+        results = [await stage.put(item) for item in "abc"]
+        return stage, results, [stage.queue.get_nowait() for _ in range(stage.qsize())]
+
+    stage, results, remaining = run(scenario())
+    assert results[2] == (True, "a")
+    assert remaining == ["b", "c"]
+    assert stage.metrics()["dropped"] == 1
+    assert stage.metrics()["high_water"] == 2
+
+
+def test_block_waits_for_room():
+    async def scenario():
+        stage = BoundedStage("test", 1, "block")
+        await stage.put("a")
+        blocked = asyncio.create_task(stage.put("b"))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert await stage.get() == "a"
+        stage.task_done()
+        assert await asyncio.wait_for(blocked, 1) == (True, None)
+        return stage
+
+    stage = run(scenario())
+    assert stage.metrics()["dropped"] == 0
+    assert stage.qsize() == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedStage("test", 1, "drop_random")
+
+
+def test_upload_byte_ceiling_rejects_oversized_backlog():
+    async def scenario():
+        admission = UploadAdmission("drop_newest", max_queued=10, max_pending_bytes=100)
+        first = await admission.submit("ws1", b"x" * 60)
+        second = await admission.submit("ws2", b"x" * 60)
+        third = await admission.submit("ws3", b"x" * 40)
+        return admission, first, second, third
+
+    admission, first, second, third = run(scenario())
+    assert first == (0, None)
+    assert second == (None, None)
+    assert third == (1, None)
+    assert admission.pending_bytes == 100
+    assert admission.rejected_for_bytes == 1
+    assert admission.peak_pending_bytes <= admission.max_pending_bytes
+
+
+def test_upload_byte_ceiling_releases_bytes_on_eviction_and_completion():
+    async def scenario():
+        admission = UploadAdmission("drop_oldest", max_queued=2, max_pending_bytes=100)
+        await admission.submit("ws1", b"x" * 30)
+        await admission.submit("ws2", b"x" * 30)
+        position, evicted = await admission.submit("ws3", b"x" * 30)
+        assert position == 1
+        assert evicted == ("ws1", b"x" * 30)
+        assert admission.pending_bytes == 60
+        job = await admission.next_job()
+        assert job[0] == "ws2"
+        # Still counted while in progress
+        assert admission.pending_bytes == 60
+        admission.job_done(job)
+        return admission
+
+    admission = run(scenario())
+    assert admission.pending_bytes == 30
+    assert admission.in_progress == 0
+    assert admission.peak_pending_bytes <= admission.max_pending_bytes
+
+
+def test_upload_refused_by_full_stage_does_not_leak_bytes():
+    async def scenario():
+        admission = UploadAdmission("drop_newest", max_queued=1, max_pending_bytes=100)
+        await admission.submit("ws1", b"x" * 10)
+        refused = await admission.submit("ws2", b"x" * 10)
+        return admission, refused
+
+    admission, refused = run(scenario())
+    assert refused == (None, None)
+    assert admission.pending_bytes == 10
+    assert admission.stage.metrics()["dropped"] == 1
+
+
+def test_blocked_upload_reserves_its_bytes():
+    async def scenario():
+        admission = UploadAdmission("block", max_queued=1, max_pending_bytes=100)
+        await admission.submit("ws1", b"x" * 50)
+        waiting = asyncio.create_task(admission.submit("ws2", b"x" * 50))
+        await asyncio.sleep(0.01)
+        # The blocked upload already holds its share of the ceiling
+        over = await admission.submit("ws3", b"x" * 1)
+        job = await admission.next_job()
+        admission.job_done(job)
+        await asyncio.wait_for(waiting, 1)
+        return admission, over
+
+    admission, over = run(scenario())
+    assert over == (None, None)
+    assert admission.pending_bytes == 50
+    assert admission.peak_pending_bytes == 100
+
+
+def test_burst_positions_count_free_slots_before_dispatch():
+    async def scenario():
+        admission = UploadAdmission("drop_newest", max_queued=8, max_pending_bytes=100, slots=1)
+        # Submitted back to back, before any dispatcher has taken the first one
+        return [(await admission.submit(f"ws{i}", b"x"))[0] for i in range(3)]
+
+    assert run(scenario()) == [0, 1, 2]
+
+
+def test_positions_account_for_uploads_in_progress():
+    async def scenario():
+        admission = UploadAdmission("drop_newest", max_queued=8, max_pending_bytes=100, slots=2)
+        await admission.submit("ws1", b"x")
+        await admission.next_job()
+        second = (await admission.submit("ws2", b"x"))[0]
+        third = (await admission.submit("ws3", b"x"))[0]
+        return second, third
+
+    assert run(scenario()) == (0, 1)
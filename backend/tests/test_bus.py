@@ -0,0 +1,76 @@
+import asyncio
+
+from bus import InProcessBus, SUBTITLES, EVENTS
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def collect(bus, channel, count):
+    received = []
+    async for message in bus.subscribe(channel):
+        received.append(message)
+        if len(received) == count:
+            return received
+
+
+def test_every_subscriber_sees_every_message():
+    async def scenario():
+        bus = InProcessBus()
+        subscribers = [asyncio.create_task(collect(bus, SUBTITLES, 2)) for _ in range(3)]
+        await asyncio.sleep(0) # Let the subscriptions register
+        await bus.publish(SUBTITLES, {"n": 1})
+        await bus.publish(SUBTITLES, {"n": 2})
+        return await asyncio.wait_for(asyncio.gather(*subscribers), 1)
+
+    assert run(scenario()) == [[{"n": 1}, {"n": 2}]] * 3
+
+
+def test_channels_are_separate():
+    async def scenario():
+        bus = InProcessBus()
+        events = asyncio.create_task(collect(bus, EVENTS, 1))
+        await asyncio.sleep(0)
+        await bus.publish(SUBTITLES, {"type": "final"})
+        await bus.publish(EVENTS, {"type": "job_done"})
+        return await asyncio.wait_for(events, 1)
+
+    assert run(scenario()) == [{"type": "job_done"}]
+
+
+def test_finished_subscriber_is_unregistered():
+    async def scenario():
+        bus = InProcessBus()
+        subscriber = asyncio.create_task(collect(bus, SUBTITLES, 1))
+        await asyncio.sleep(0)
+        await bus.publish(SUBTITLES, {"n": 1})
+        await subscriber
+        return bus._subscribers[SUBTITLES]
+
+    assert run(scenario()) == []
+
+
+def test_each_job_is_pulled_exactly_once():
+    async def scenario():
+        bus = InProcessBus()
+        pulled = []
+
+        async def worker(name):
+            while True:
+                job_id, _ = await bus.pull_job()
+                pulled.append((name, job_id))
+                await asyncio.sleep(0)
+
+        workers = [asyncio.create_task(worker(name)) for name in ("w1", "w2", "w3")]
+        for i in range(9):
+            await bus.push_job(f"job{i}", b"audio")
+        for _ in range(20):
+            await asyncio.sleep(0)
+        for task in workers:
+            task.cancel()
+        return pulled
+
+    pulled = run(scenario())
+    assert sorted(job_id for _, job_id in pulled) == [f"job{i}" for i in range(9)]
+    assert len({name for name, _ in pulled}) > 1 # Spread over the workers
@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+import engine_strategy
+from engine_strategy import EngineCancelled, EngineSelector
+
+
+def fixed(result, delay=0.0):
+    def backend(job, cancel=None):
+        if delay:
+            time.sleep(delay)
+        return result
+    return backend
+
+
+def failing(job, cancel=None):
+    raise RuntimeError("down")
+
+
+def test_fallback_used_when_primary_fails():
+    selector = EngineSelector("Test", {"cloud": failing, "local": fixed("local")}, "cloud", "local", "fallback")
+    assert selector.run("job") == "local"
+    assert selector.fallbacks == 1
+
+
+def test_fallback_used_when_primary_result_unusable():
+    selector = EngineSelector("Test", {"cloud": fixed(""), "local": fixed("local")}, "cloud", "local", "fallback")
+    assert selector.run("job") == "local"
+
+
+def test_single_strategy_raises():
+    selector = EngineSelector("Test", {"cloud": failing, "local": fixed("local")}, "cloud", "local", "single")
+    with pytest.raises(RuntimeError):
+        selector.run("job")
+
+
+def test_without_distinct_fallback_strategy_is_single():
+    selector = EngineSelector("Test", {"local": fixed("local")}, "local", "local", "hedged")
+    assert selector.strategy == "single"
+
+
+def test_unknown_backend_or_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        EngineSelector("Test", {"local": fixed("x")}, "cloud")
+    with pytest.raises(ValueError):
+        EngineSelector("Test", {"local": fixed("x")}, "local", strategy="fastest")
+
+
+def test_hedged_fast_primary_wins_without_hedging():
+    selector = EngineSelector("Test", {"cloud": fixed("cloud"), "local": fixed("local")}, "cloud", "local", "hedged")
+    assert selector.run("job") == "cloud"
+    assert selector.hedges == 0
+
+
+def test_hedged_slow_primary_is_cancelled(monkeypatch):
+    monkeypatch.setattr(engine_strategy, "DEFAULT_HEDGE_DELAY_S", 0.05)
+    cancelled = threading.Event()
+
+    def slow(job, cancel=None):
+        if cancel.wait(2):
+            cancelled.set()
+            raise EngineCancelled("lost")
+        return "cloud"
+
+    selector = EngineSelector("Test", {"cloud": slow, "local": fixed("local")}, "cloud", "local", "hedged")
+    assert selector.run("job") == "local"
+    assert selector.hedges == 1
+    assert cancelled.wait(1)
+
+
+def test_hung_primaries_do_not_starve_the_fallback(monkeypatch):
+    monkeypatch.setattr(engine_strategy, "DEFAULT_HEDGE_DELAY_S", 0.05)
+    release = threading.Event()
+    selector = EngineSelector(
+        "Test", {"cloud": lambda job, cancel=None: release.wait(5), "local": fixed("local")}, "cloud", "local", "hedged"
+    )
+    try:
+        for _ in range(engine_strategy.HEDGE_THREADS_PER_BACKEND + 2):
+            started = time.monotonic()
+            assert selector.run("job") == "local"
+            assert time.monotonic() - started < 1
+    finally:
+        release.set()
+
+
+def test_empty_result_returned_if_nothing_better():
+    selector = EngineSelector("Test", {"cloud": fixed([]), "local": fixed([])}, "cloud", "local", "hedged", is_usable=bool)
+    assert selector.run("job") == []
+
+
+def test_hedge_delay_scales_with_job_size():
+    selector = EngineSelector(
+        "Test", {"cloud": fixed("cloud"), "local": fixed("local")}, "cloud", "local", "hedged", job_size=len
+    )
+    for _ in range(engine_strategy.MIN_LATENCY_SAMPLES):
+        selector.latency["cloud"].record(0.01)
+    assert selector.hedge_delay("x" * 10) == pytest.approx(0.1)
+    assert selector.hedge_delay("x" * 100) == pytest.approx(1.0)
+
+
+def test_losing_primary_that_runs_to_completion_still_records_latency(monkeypatch):
+    monkeypatch.setattr(engine_strategy, "DEFAULT_HEDGE_DELAY_S", 0.05)
+    finished = threading.Event()
+
+    def uninterruptible(job, cancel=None):
+        time.sleep(0.2) # Like a sync Google recognize call, ignores cancel
+        finished.set()
+        return "cloud"
+
+    selector = EngineSelector("Test", {"cloud": uninterruptible, "local": fixed("local")}, "cloud", "local", "hedged")
+    assert selector.run("job") == "local"
+    assert finished.wait(1)
+    deadline = time.monotonic() + 1
+    while not selector.latency["cloud"].samples and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(selector.latency["cloud"].samples) == [pytest.approx(0.2, abs=0.1)]
+
+
+def test_cancelled_primary_records_no_latency(monkeypatch):
+    monkeypatch.setattr(engine_strategy, "DEFAULT_HEDGE_DELAY_S", 0.05)
+    stopped = threading.Event()
+
+    def cancellable(job, cancel=None):
+        cancel.wait(2)
+        stopped.set()
+        raise EngineCancelled("lost")
+
+    selector = EngineSelector("Test", {"cloud": cancellable, "local": fixed("local")}, "cloud", "local", "hedged")
+    assert selector.run("job") == "local"
+    assert stopped.wait(1)
+    time.sleep(0.05)
+    assert not selector.latency["cloud"].samples
@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+from bus import InProcessBus, EVENTS
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # A fan-out node: no inference stack, and history/settings paths resolved under tmp_path
+    monkeypatch.setenv("BACKEND_ROLE", "fanout")
+    monkeypatch.setenv("WORKER_SLOTS", "1")
+    workdir = tmp_path / "backend"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    sys.modules.pop("main", None)
+    module = importlib.import_module("main")
+    yield module
+    module.subtitle_history.close()
+    sys.modules.pop("main", None)
+
+
+async def start_fanout(main):
+    main._main_event_loop = asyncio.get_running_loop()
+    main.bus = InProcessBus()
+    tasks = [asyncio.create_task(main.track_worker_events()), asyncio.create_task(main.dispatch_uploads())]
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_job_done_event_frees_the_slot(main):
+    async def scenario():
+        tasks = await start_fanout(main)
+        await main.upload_admission.submit("ws1", b"first")
+        await main.upload_admission.submit("ws2", b"second")
+        job_id, audio = await asyncio.wait_for(main.bus.pull_job(), 1)
+        assert audio == b"first"
+        assert main.upload_admission.in_progress == 1
+        # Only one slot: the second upload waits until the worker reports back
+        await asyncio.sleep(0.05)
+        assert main.bus._jobs.empty()
+        await main.bus.publish(EVENTS, {"type": "job_done", "job_id": job_id, "worker": "w1"})
+        job_id, audio = await asyncio.wait_for(main.bus.pull_job(), 1)
+        assert audio == b"second"
+        await main.bus.publish(EVENTS, {"type": "job_done", "job_id": job_id, "worker": "w1"})
+        for _ in range(10):
+            await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        return main.upload_admission
+
+    admission = asyncio.run(scenario())
+    assert admission.in_progress == 0
+    assert admission.pending_bytes == 0
+    assert main.pending_jobs == {}
+
+
+def test_slot_is_freed_when_a_worker_never_reports(main, monkeypatch):
+    monkeypatch.setattr(main, "JOB_TIMEOUT_S", 0.05)
+
+    async def scenario():
+        tasks = await start_fanout(main)
+        await main.upload_admission.submit("ws1", b"lost")
+        await main.upload_admission.submit("ws2", b"next")
+        await asyncio.wait_for(main.bus.pull_job(), 1) # Taken by a worker that dies
+        _, audio = await asyncio.wait_for(main.bus.pull_job(), 1)
+        for task in tasks:
+            task.cancel()
+        return audio
+
+    assert asyncio.run(scenario()) == b"next"
+    assert main.pending_jobs == {}
+
+
+def test_worker_metrics_are_tracked_per_worker(main):
+    async def scenario():
+        tasks = await start_fanout(main)
+        await main.bus.publish(EVENTS, {"type": "metrics", "worker": "w1", "stt": {}})
+        await main.bus.publish(EVENTS, {"type": "metrics", "worker": "w2", "stt": {}})
+        for _ in range(5):
+            await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert set(main.worker_metrics) == {"w1", "w2"}
@@ -0,0 +1,104 @@
+from segmenter import MAX_SENTENCE_CHARS, PAUSE_SPLIT_S, length_buckets, resegment, translate_segments
+
+
+def segment(start, end, text, **extra):
+    return {"start": start, "end": end, "text": text, "confidence": 0.9, **extra}
+
+
+def test_splits_on_danda_and_shares_out_time():
+    sentences = resegment([segment(0.0, 4.0, "मैं घर गया। फिर खाना खाया।")])
+    assert [s["text"] for s in sentences] == ["मैं घर गया।", "फिर खाना खाया।"]
+    assert sentences[0]["start"] == 0.0
+    assert sentences[0]["end"] == sentences[1]["start"]
+    assert sentences[1]["end"] == 4.0
+
+
+def test_split_uses_word_timings_when_they_line_up():
+    words = [{"start": float(i), "end": i + 0.5, "word": w} for i, w in enumerate(["एक", "दो?", "तीन", "चार"])]
+    sentences = resegment([segment(0.0, 4.0, "एक दो? तीन चार", words=words)])
+    assert [(s["start"], s["end"]) for s in sentences] == [(0.0, 1.5), (2.0, 3.5)]
+    assert [len(s["words"]) for s in sentences] == [2, 2]
+
+
+def test_merges_unterminated_fragment_across_short_pause():
+    sentences = resegment([segment(0.0, 2.0, "फिर खाना खाया"), segment(2.2, 3.0, "और सो गया।", confidence=0.5)])
+    assert len(sentences) == 1
+    assert sentences[0]["text"] == "फिर खाना खाया और सो गया।"
+    assert (sentences[0]["start"], sentences[0]["end"]) == (0.0, 3.0)
+    assert sentences[0]["confidence"] == 0.5
+
+
+def test_long_pause_is_a_boundary():
+    sentences = resegment([segment(0.0, 1.0, "कल मिलेंगे"), segment(1.0 + PAUSE_SPLIT_S, 3.0, "क्या")])
+    assert [s["text"] for s in sentences] == ["कल मिलेंगे", "क्या"]
+
+
+def test_merge_stops_at_max_sentence_chars():
+    chunk = "क" * (MAX_SENTENCE_CHARS // 2 + 1)
+    sentences = resegment([segment(0.0, 1.0, chunk), segment(1.0, 2.0, chunk)])
+    assert len(sentences) == 2
+
+
+def test_untimed_text_is_split_without_times():
+    sentences = resegment([{"start": None, "end": None, "text": "एक। दो? तीन", "confidence": None}])
+    assert [s["text"] for s in sentences] == ["एक।", "दो?", "तीन"]
+    assert all(s["start"] is None and s["end"] is None for s in sentences)
+
+
+def test_empty_segments_are_skipped():
+    assert resegment([segment(0.0, 1.0, "")]) == []
+
+
+def test_length_buckets_cover_every_index_once_and_group_similar_lengths():
+    texts = ["a" * 5, "a" * 100, "a" * 8, "a" * 30, "a" * 140, "a" * 7]
+    batches = length_buckets(texts)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(texts)))
+    assert [0, 5, 2] in batches
+    assert [1, 4] in batches
+
+
+def test_length_buckets_respect_max_batch():
+    batches = length_buckets(["x"] * 5, max_batch=2)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_back_to_back_segments_keep_marked_boundaries():
+    # Google results without word offsets: no gap to measure, but each result end is a break
+    sentences = resegment([
+        segment(0.0, 2.0, "कल मिलेंगे", boundary=True),
+        segment(2.0, 4.0, "फिर बात करेंगे", boundary=True),
+    ])
+    assert [s["text"] for s in sentences] == ["कल मिलेंगे", "फिर बात करेंगे"]
+    assert all("boundary" not in s for s in sentences)
+
+
+def test_boundary_survives_split_on_last_piece():
+    sentences = resegment([
+        segment(0.0, 4.0, "एक बात। दूसरी बात", boundary=True),
+        segment(4.0, 5.0, "तीसरी"),
+    ])
+    assert [s["text"] for s in sentences] == ["एक बात।", "दूसरी बात", "तीसरी"]
+
+
+class StubTranslator:
+    def __init__(self, translations):
+        self.translations = translations
+        self.batches = []
+
+    def translate_batch(self, texts):
+        self.batches.append(texts)
+        return self.translations
+
+
+def test_translate_segments_attaches_each_translation_in_one_batch():
+    segments = [segment(0.0, 1.0, "एक"), segment(1.0, 2.0, "दो")]
+    translator = StubTranslator(["one", "two"])
+    assert translate_segments(segments, translator) == "one two"
+    assert translator.batches == [["एक", "दो"]]
+    assert [s["english"] for s in segments] == ["one", "two"]
+
+
+def test_translate_segments_with_short_reply_leaves_missing_ones_empty():
+    segments = [segment(0.0, 1.0, "एक"), segment(1.0, 2.0, "दो"), segment(2.0, 3.0, "तीन")]
+    assert translate_segments(segments, StubTranslator(["one"])) == "one"
+    assert [s["english"] for s in segments] == ["one", "", ""]
@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+stt_engine = pytest.importorskip("stt_engine")
+
+
+class FakeWhisperSegment:
+    def __init__(self, start, end, text, avg_logprob=-0.1, words=None):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.avg_logprob = avg_logprob
+        self.words = words
+
+
+class FakeWhisperModel:
+    def __init__(self, segments):
+        self.segments = segments
+
+    def transcribe(self, audio, **kwargs):
+        return iter(self.segments), None
+
+
+@pytest.fixture
+def engine():
+    return stt_engine.STTEngine(settings={"stt_engine": "whisper", "stt_strategy": "single"})
+
+
+def test_model_load_is_not_counted_as_decode_time(engine, monkeypatch):
+    def slow_load(model_size):
+        time.sleep(0.3)
+        return FakeWhisperModel([FakeWhisperSegment(0.0, 1.0, "नमस्ते")])
+
+    monkeypatch.setattr(engine, "get_whisper_model", slow_load)
+    engine.transcribe_whisper(b"\x00\x00" * 16000)
+    # One second of audio decoded instantly; the 0.3 s load must not show up as RTF
+    assert engine.whisper_controller.rtf < 0.1
+
+
+class FakeSpeechClient:
+    def __init__(self, response):
+        self.response = response
+        self.config = None
+
+    def recognize(self, config, audio, timeout=None):
+        self.config = config
+        return self.response
+
+
+def google_word(start, end, word):
+    return SimpleNamespace(start_time=timedelta(seconds=start), end_time=timedelta(seconds=end), word=word)
+
+
+def google_result(end, transcript, confidence=0.9, words=()):
+    alternative = SimpleNamespace(transcript=transcript, confidence=confidence, words=list(words))
+    return SimpleNamespace(result_end_time=timedelta(seconds=end), alternatives=[alternative])
+
+
+def test_google_results_follow_each_other_and_mark_boundaries(engine):
+    engine.client = FakeSpeechClient(SimpleNamespace(results=[
+        google_result(2.5, " पहला वाक्य "),
+        SimpleNamespace(result_end_time=timedelta(seconds=3.0), alternatives=[]),
+        google_result(6.0, "दूसरा वाक्य", confidence=0.0),
+    ]))
+    segments = engine.transcribe_google(b"")
+    assert segments == [
+        {"start": 0.0, "end": 2.5, "text": "पहला वाक्य", "confidence": 0.9, "boundary": True},
+        {"start": 2.5, "end": 6.0, "text": "दूसरा वाक्य", "confidence": None, "boundary": True},
+    ]
+    assert engine.client.config.enable_automatic_punctuation
+
+
+def test_google_word_offsets_set_start_and_words(engine, monkeypatch):
+    monkeypatch.setattr(stt_engine, "WORD_TIMESTAMPS", True)
+    engine.client = FakeSpeechClient(SimpleNamespace(results=[
+        google_result(3.0, "नमस्ते दुनिया", words=[google_word(0.4, 1.0, "नमस्ते"), google_word(1.2, 2.0, "दुनिया")]),
+    ]))
+    [segment] = engine.transcribe_google(b"")
+    assert segment["start"] == 0.4
+    assert segment["end"] == 3.0
+    assert [w["word"] for w in segment["words"]] == ["नमस्ते", "दुनिया"]
+    assert segment["words"][1] == {"start": 1.2, "end": 2.0, "word": "दुनिया", "probability": None}
+    assert "boundary" not in segment
+
+
+def test_whisper_segment_conversion():
+    words = [SimpleNamespace(start=0.12341, end=0.5, word=" नमस्ते", probability=0.98765)]
+    segment = stt_engine.STTEngine._whisper_segment(FakeWhisperSegment(0.12341, 1.56789, " नमस्ते ", avg_logprob=0.0, words=words))
+    assert segment == {
+        "start": 0.123,
+        "end": 1.568,
+        "text": "नमस्ते",
+        "confidence": 1.0,
+        "words": [{"start": 0.123, "end": 0.5, "word": "नमस्ते", "probability": 0.988}],
+    }
+
+
+def test_whisper_segment_without_words_has_no_words_key():
+    segment = stt_engine.STTEngine._whisper_segment(FakeWhisperSegment(0.0, 1.0, "नमस्ते", avg_logprob=-0.6931))
+    assert "words" not in segment
+    assert segment["confidence"] == 0.5
+
+
+def test_transcribe_whisper_returns_segment_dicts(engine, monkeypatch):
+    model = FakeWhisperModel([FakeWhisperSegment(0.0, 1.0, "एक"), FakeWhisperSegment(1.0, 2.0, "दो")])
+    monkeypatch.setattr(engine, "get_whisper_model", lambda model_size: model)
+    segments = engine.transcribe_whisper(b"\x00\x00" * 32000)
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [(0.0, 1.0, "एक"), (1.0, 2.0, "दो")]
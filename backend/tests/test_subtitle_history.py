@@ -0,0 +1,69 @@
+import io
+
+from subtitle_history import SubtitleHistory, export
+
+
+def final(epoch, hindi, english, segments=None):
+    entry = {"type": "final", "timestamp": epoch, "hindi": hindi, "english": english}
+    if segments is not None:
+        entry["segments"] = segments
+    return entry
+
+
+def test_ring_keeps_only_the_most_recent_entries():
+    history = SubtitleHistory(session_id="s", history_dir=None, ring_size=3)
+    for i in range(10):
+        history.append(final(1000.0 + i, f"h{i}", f"e{i}"))
+    assert len(history) == 3
+    assert [e["english"] for e in history.last(10)] == ["e7", "e8", "e9"]
+    assert [e["english"] for e in history.last(1)] == ["e9"]
+
+
+def test_since_returns_entries_after_timestamp():
+    history = SubtitleHistory(session_id="s", history_dir=None)
+    for i in range(5):
+        history.append(final(1000.0 + i, f"h{i}", f"e{i}"))
+    assert [e["english"] for e in history.since(1002.0)] == ["e3", "e4"]
+    assert [e["english"] for e in history.since("1970-01-01T00:16:42+00:00")] == ["e3", "e4"]
+
+
+def test_replay_message_is_one_batched_reply():
+    history = SubtitleHistory(session_id="s", history_dir=None)
+    history.append(final(1000.0, "h", "e"))
+    reply = history.replay_message({"type": "history_request", "last": 5})
+    assert reply["type"] == "history"
+    assert reply["session"] == "s"
+    assert [e["english"] for e in reply["entries"]] == ["e"]
+
+
+def test_clock_stepping_back_keeps_index_monotonic():
+    history = SubtitleHistory(session_id="s", history_dir=None)
+    history.append(final(1000.0, "a", "a"))
+    history.append(final(999.0, "b", "b"))
+    assert [e["english"] for e in history.since(999.5)] == ["a", "b"]
+
+
+def test_export_srt_from_log_with_one_cue_per_timed_segment(tmp_path):
+    history = SubtitleHistory(session_id="s", history_dir=str(tmp_path))
+    history.append(final(1000.0, "h1", "e1"))
+    history.append(final(1002.0, "h2 h3", "e2 e3", segments=[
+        {"start": 0.0, "end": 1.0, "text": "h2", "english": "e2"},
+        {"start": 1.5, "end": 2.5, "text": "h3", "english": "e3"},
+    ]))
+    history.close()
+    out = io.StringIO()
+    export(history.log_path, out, "srt", include_hindi=False)
+    assert out.getvalue() == (
+        "1\n00:00:00,000 --> 00:00:02,000\ne1\n\n"
+        "2\n00:00:02,000 --> 00:00:03,000\ne2\n\n"
+        "3\n00:00:03,500 --> 00:00:04,500\ne3\n\n"
+    )
+
+
+def test_export_vtt_header_and_separator(tmp_path):
+    history = SubtitleHistory(session_id="s", history_dir=str(tmp_path))
+    history.append(final(1000.0, "h", "e"))
+    history.close()
+    out = io.StringIO()
+    export(history.log_path, out, "vtt")
+    assert out.getvalue() == "WEBVTT\n\n00:00:00.000 --> 00:00:04.000\nh\ne\n\n"
@@ -0,0 +1,77 @@
+import whisper_controller
+from whisper_controller import AdaptiveWhisperController, MIN_SAMPLES_BEFORE_SWITCH, SWITCH_COOLDOWN_S
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_jobs(controller, rtf, count=MIN_SAMPLES_BEFORE_SWITCH):
+    for _ in range(count):
+        controller.job_started()
+        controller.job_finished(10.0, 10.0 * rtf)
+
+
+def test_downshifts_when_falling_behind(monkeypatch):
+    monkeypatch.setattr(whisper_controller.time, "monotonic", Clock())
+    controller = AdaptiveWhisperController()
+    run_jobs(controller, 1.5)
+    assert controller.level == 1
+    assert controller.downshifts == 1
+
+
+def test_cooldown_prevents_flapping(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(whisper_controller.time, "monotonic", clock)
+    controller = AdaptiveWhisperController()
+    run_jobs(controller, 1.5)
+    run_jobs(controller, 1.5)
+    assert controller.level == 1
+    clock.now += SWITCH_COOLDOWN_S
+    run_jobs(controller, 1.5)
+    assert controller.level == 2
+
+
+def test_upshifts_with_sustained_headroom(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(whisper_controller.time, "monotonic", clock)
+    controller = AdaptiveWhisperController()
+    run_jobs(controller, 1.5)
+    clock.now += SWITCH_COOLDOWN_S
+    run_jobs(controller, 0.1)
+    assert controller.level == 0
+    assert controller.upshifts == 1
+
+
+def test_middling_rtf_holds_level(monkeypatch):
+    monkeypatch.setattr(whisper_controller.time, "monotonic", Clock())
+    controller = AdaptiveWhisperController()
+    run_jobs(controller, 0.6, count=10)
+    assert controller.level == 0
+    assert controller.switches == 0
+
+
+def test_queued_uploads_count_towards_backlog(monkeypatch):
+    monkeypatch.setattr(whisper_controller.time, "monotonic", Clock())
+    queued = [0]
+    controller = AdaptiveWhisperController(queue_depth=lambda: queued[0])
+    assert controller.backlog == 0
+    queued[0] = 3
+    assert controller.backlog == 3
+    # Fast enough on its own, but the queue is growing
+    run_jobs(controller, 0.3)
+    assert controller.level == 1
+
+
+def test_stops_at_the_bottom_of_the_ladder(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(whisper_controller.time, "monotonic", clock)
+    controller = AdaptiveWhisperController()
+    for _ in range(len(controller.ladder) + 2):
+        run_jobs(controller, 2.0)
+        clock.now += SWITCH_COOLDOWN_S
+    assert controller.settings == controller.ladder[-1]
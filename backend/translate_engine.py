@@ -2,13 +2,29 @@ import os
 import logging
 import requests
 from dotenv import load_dotenv
-from transformers import MarianMTModel, MarianTokenizer
+from transformers import MarianMTModel, MarianTokenizer, StoppingCriteria, StoppingCriteriaList
 import torch
 
+from engine_strategy import EngineSelector, EngineCancelled
+from settings import load_settings
+from segmenter import length_buckets
+
 load_dotenv(dotenv_path='../config/.env')
 
+# Backends in preference order; the last one is local and the fallback for the others
+TRANSLATION_BACKENDS = ("deepl", "marianmt")
+DEEPL_TIMEOUT_S = 10.0  # So a request that lost a hedge does not hold its thread forever
+
+class _CancelGeneration(StoppingCriteria):
+    # Lets a hedged MarianMT call that lost stop at the next decoding step
+    def __init__(self, cancel):
+        self.cancel = cancel
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancel.is_set()
+
 class TranslationEngine:
-    def __init__(self):
+    def __init__(self, settings=None):
         self.deepl_api_key = os.getenv("DEEPL_API_KEY")
         if not self.deepl_api_key or self.deepl_api_key == "your_deepl_api_key":
             logging.warning("DeepL API key not found or is a placeholder. DeepL translation will not work.")
@@ -16,6 +32,23 @@ class TranslationEngine:
         self._marian_model = None
         self._marian_tokenizer = None
 
+        settings = settings if settings is not None else load_settings()
+        primary = settings.get("translation_engine", "deepl")
+        if primary not in TRANSLATION_BACKENDS:
+            logging.warning(f"Unknown translation_engine '{primary}' in settings, using deepl.")
+            primary = "deepl"
+        if primary == "deepl" and not self.deepl_api_key:
+            primary = "marianmt"
+        self.selector = EngineSelector(
+            "Translation",
+            {"deepl": self.translate_deepl_batch, "marianmt": self.translate_marianmt_batch},
+            primary,
+            fallback="marianmt",
+            strategy=settings.get("translation_strategy", "fallback"),
+            is_usable=lambda translations: len(translations) > 0,
+            job_size=lambda texts: sum(len(text) for text in texts),
+        )
+
     @property
     def marian_model(self):
         if self._marian_model is None:
@@ -32,34 +65,38 @@ class TranslationEngine:
             logging.info("MarianMT tokenizer loaded.")
         return self._marian_tokenizer
 
-    def translate_deepl(self, text: str) -> str:
-        logging.info("Translating with DeepL...")
+    def translate_deepl_batch(self, texts: list, cancel=None) -> list:
+        logging.info(f"Translating {len(texts)} texts with DeepL...")
         url = "https://api-free.deepl.com/v2/translate"
-        params = {
-            "auth_key": self.deepl_api_key,
-            "text": text,
-            "source_lang": "HI",
-            "target_lang": "EN-US",
-        }
-        response = requests.post(url, data=params)
+        # Repeated "text" fields are translated in one request, results in the same order
+        params = [("auth_key", self.deepl_api_key), ("source_lang", "HI"), ("target_lang", "EN-US")]
+        params += [("text", text) for text in texts]
+        response = requests.post(url, data=params, timeout=DEEPL_TIMEOUT_S)
         response.raise_for_status()
-        return response.json()["translations"][0]["text"]
+        return [translation["text"] for translation in response.json()["translations"]]
 
-    def translate_marianmt(self, text: str) -> str:
-        logging.info("Translating with MarianMT...")
-        inputs = self.marian_tokenizer(text, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            generated_ids = self.marian_model.generate(**inputs)
-        return self.marian_tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
+    def translate_marianmt_batch(self, texts: list, cancel=None) -> list:
+        logging.info(f"Translating {len(texts)} texts with MarianMT...")
+        stopping_criteria = StoppingCriteriaList([_CancelGeneration(cancel)]) if cancel is not None else None
+        translations = [None] * len(texts)
+        # Batches of similar-length sentences, so short ones are not padded out to the longest
+        for bucket in length_buckets(texts):
+            inputs = self.marian_tokenizer([texts[i] for i in bucket], return_tensors="pt", padding=True)
+            with torch.no_grad():
+                generated_ids = self.marian_model.generate(**inputs, stopping_criteria=stopping_criteria)
+            if cancel is not None and cancel.is_set():
+                raise EngineCancelled("MarianMT translation cancelled")
+            for i, translation in zip(bucket, self.marian_tokenizer.batch_decode(generated_ids, skip_special_tokens=True)):
+                translations[i] = translation
+        return translations
 
     def translate(self, hindi_text: str) -> str:
-        if self.deepl_api_key:
-            try:
-                translated_text = self.translate_deepl(hindi_text)
-                logging.info("DeepL translation successful.")
-                return translated_text
-            except Exception as e:
-                logging.warning(f"DeepL translation failed: {e}. Falling back to MarianMT.")
-                return self.translate_marianmt(hindi_text)
-        else:
-            return self.translate_marianmt(hindi_text)
\ No newline at end of file
+        return self.translate_batch([hindi_text])[0]
+
+    def translate_batch(self, hindi_texts: list) -> list:
+        if not hindi_texts:
+            return []
+        return self.selector.run(hindi_texts)
+
+    def metrics(self) -> dict:
+        return {"selector": self.selector.metrics()}
@@ -0,0 +1,109 @@
+import time
+import logging
+import threading
+
+# Settings ladder from most accurate to fastest; beam size is cheaper to drop than the model
+WHISPER_LADDER = [
+    ("small", 5),
+    ("small", 1),
+    ("base", 1),
+    ("tiny", 1),
+]
+
+RTF_SMOOTHING = 0.3  # EWMA weight of the newest real-time-factor sample
+DOWNSHIFT_RTF = 0.9  # Falling behind: processing takes nearly as long as the audio
+UPSHIFT_RTF = 0.35  # Clear headroom; the next level up is usually 2-3x slower
+DOWNSHIFT_BACKLOG = 2  # Jobs waiting behind the current one, in flight or still queued
+MIN_SAMPLES_BEFORE_SWITCH = 2  # Samples at the current level before deciding again
+SWITCH_COOLDOWN_S = 20.0  # Minimum time between switches
+
+
+class AdaptiveWhisperController:
+    """Picks the Whisper model/beam size from the observed real-time factor and backlog.
+
+    STTEngine reports every Whisper job through job_started()/job_finished(); the
+    controller moves one step down WHISPER_LADDER when transcription falls behind and
+    one step back up when there is sustained headroom. The gap between the two
+    thresholds plus the cooldown keeps it from flapping.
+
+    Uploads wait in the admission queue (or on a fan-out node) rather than in
+    STTEngine, so ``queue_depth`` is a callable the owner sets to report them.
+    """
+
+    def __init__(self, ladder=WHISPER_LADDER, queue_depth=lambda: 0):
+        self.ladder = ladder
+        self.queue_depth = queue_depth
+        self.level = 0
+        self.rtf = None
+        self.in_flight = 0
+        self.switches = 0
+        self.downshifts = 0
+        self.upshifts = 0
+        self._samples_at_level = 0
+        self._last_switch = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self):
+        """Current (model_size, beam_size)."""
+        return self.ladder[self.level]
+
+    @property
+    def backlog(self):
+        return max(self.in_flight - 1, 0) + self.queue_depth()
+
+    def job_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def job_finished(self, audio_seconds: float, elapsed_seconds: float):
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            if audio_seconds <= 0:
+                return
+            sample = elapsed_seconds / audio_seconds
+            self.rtf = sample if self.rtf is None else RTF_SMOOTHING * sample + (1 - RTF_SMOOTHING) * self.rtf
+            self._samples_at_level += 1
+            self._maybe_switch()
+
+    def _maybe_switch(self):
+        if self._samples_at_level < MIN_SAMPLES_BEFORE_SWITCH:
+            return
+        if time.monotonic() - self._last_switch < SWITCH_COOLDOWN_S:
+            return
+        behind = self.rtf > DOWNSHIFT_RTF or self.backlog >= DOWNSHIFT_BACKLOG
+        if behind and self.level < len(self.ladder) - 1:
+            self._switch(self.level + 1, "down")
+        elif not behind and self.rtf < UPSHIFT_RTF and self.backlog == 0 and self.level > 0:
+            self._switch(self.level - 1, "up")
+
+    def _switch(self, level, direction):
+        old_model, old_beam = self.settings
+        self.level = level
+        new_model, new_beam = self.settings
+        self.switches += 1
+        if direction == "down":
+            self.downshifts += 1
+        else:
+            self.upshifts += 1
+        logging.warning(
+            f"Whisper {direction}shift: {old_model}/beam {old_beam} -> {new_model}/beam {new_beam} "
+            f"(RTF {self.rtf:.2f}, backlog {self.backlog})"
+        )
+        self._last_switch = time.monotonic()
+        self._samples_at_level = 0
+        # The new level runs a different model, so its RTF has to be measured afresh
+        self.rtf = None
+
+    def metrics(self) -> dict:
+        model_size, beam_size = self.settings
+        return {
+            "whisper_model": model_size,
+            "whisper_beam_size": beam_size,
+            "whisper_level": self.level,
+            "whisper_rtf": round(self.rtf, 3) if self.rtf is not None else None,
+            "whisper_backlog": self.backlog,
+            "whisper_switches": self.switches,
+            "whisper_downshifts": self.downshifts,
+            "whisper_upshifts": self.upshifts,
+        }
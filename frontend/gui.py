@@ -1,5 +1,7 @@
 import sys
+import time
 import asyncio
+import threading
 import websockets
 import json
 import sounddevice as sd
@@ -8,10 +10,11 @@ from PyQt6.QtWidgets import (
     QComboBox, QLineEdit, QFileDialog, QCheckBox, QMainWindow, QFrame
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt6.QtGui import QColor, QPalette, QFont
+from PyQt6.QtGui import QColor, QPalette, QFont, QGuiApplication
 
 class WebSocketClient(QThread):
     message_received = pyqtSignal(dict)
+    realtime_pending = pyqtSignal() # A partial is waiting in take_realtime()
     connected = pyqtSignal()
     disconnected = pyqtSignal()
 
@@ -20,6 +23,11 @@ class WebSocketClient(QThread):
         self.uri = uri
         self.websocket = None
         self.running = True
+        self.last_final_timestamp = None # Used to ask for missed subtitles after a reconnect
+        # Only the newest partial is handed to the UI thread; older ones are dropped here
+        self._pending_realtime = None
+        self._realtime_lock = threading.Lock()
+        self.coalesced_partials = 0
 
     async def connect(self):
         reconnect_attempts = 0
@@ -28,6 +36,7 @@ class WebSocketClient(QThread):
                 self.websocket = await websockets.connect(self.uri)
                 self.connected.emit()
                 reconnect_attempts = 0
+                await self.request_history()
                 await self.listen()
             except (websockets.exceptions.ConnectionClosedOK, websockets.exceptions.ConnectionClosedError):
                 print("WebSocket connection closed, attempting to reconnect...")
@@ -44,11 +53,30 @@ class WebSocketClient(QThread):
                         await self.websocket.close()
                     self.disconnected.emit()
 
+    async def request_history(self):
+        # Late joiners get the current line; reconnects get everything missed since the last final
+        if self.last_final_timestamp:
+            request = {"type": "history_request", "since": self.last_final_timestamp}
+        else:
+            request = {"type": "history_request", "last": 1}
+        await self.websocket.send(json.dumps(request))
+
     async def listen(self):
         try:
             while self.running:
                 message = await self.websocket.recv()
                 data = json.loads(message)
+                if data.get("type") == "realtime":
+                    self.queue_realtime(data)
+                    continue
+                if data.get("type") == "final":
+                    self.last_final_timestamp = data.get("timestamp")
+                    # A partial still waiting belongs before this final; drop it so the next one
+                    # is signalled after the final instead of riding an older, earlier signal
+                    with self._realtime_lock:
+                        self._pending_realtime = None
+                elif data.get("type") == "history" and data.get("entries"):
+                    self.last_final_timestamp = data["entries"][-1].get("timestamp")
                 self.message_received.emit(data)
         except (websockets.exceptions.ConnectionClosedOK, websockets.exceptions.ConnectionClosedError):
             print("WebSocket listener stopped due to connection closure.")
@@ -57,6 +85,20 @@ class WebSocketClient(QThread):
         finally:
             self.disconnected.emit()
 
+    def queue_realtime(self, data):
+        with self._realtime_lock:
+            already_pending = self._pending_realtime is not None
+            if already_pending:
+                self.coalesced_partials += 1
+            self._pending_realtime = data
+        if not already_pending:
+            self.realtime_pending.emit()
+
+    def take_realtime(self):
+        with self._realtime_lock:
+            data, self._pending_realtime = self._pending_realtime, None
+        return data
+
     def send_message(self, message):
         if self.websocket and self.websocket.state == websockets.protocol.State.OPEN:
             asyncio.run_coroutine_threadsafe(self.websocket.send(json.dumps(message)), self.loop)
@@ -81,6 +123,102 @@ class WebSocketClient(QThread):
             asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop)
         self.wait() # Wait for the thread to finish
 
+class SubtitleLabel(QLabel):
+    """QLabel that reports how long each of its paints takes to paint_observer."""
+
+    paint_observer = None
+
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        super().paintEvent(event)
+        if self.paint_observer:
+            self.paint_observer(started, time.perf_counter())
+
+class SubtitleRenderer:
+    """Coalesces subtitle updates and paints them at most once per display frame.
+
+    Messages only record the text each label should show; a single-shot timer set to
+    the screen's refresh interval applies the latest state. Partials replaced before
+    they were painted are counted as dropped, and labels whose text is unchanged are
+    not touched, so they do not re-layout.
+
+    Frame times come from the labels' own paint events, since Qt lays out and paints
+    after setText returns: "paint" is the time spent painting the labels an update
+    changed, "latency" the time from applying the update until they were painted.
+    """
+
+    def __init__(self):
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 60.0
+        self.frame_interval_ms = max(int(1000 / (refresh_rate or 60.0)), 1)
+        self.targets = [] # (labels by role, clear_on_status, desired text by role)
+        self.dirty = False
+        self.frames = 0
+        self.dropped_updates = 0
+        self.last_paint_ms = 0.0
+        self.max_paint_ms = 0.0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._applied_at = None # When the frame being painted was handed to Qt
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.paint)
+
+    def use_screen(self, screen):
+        # Pace to the display the subtitles are actually on (e.g. the projector)
+        if screen and screen.refreshRate():
+            self.frame_interval_ms = max(int(1000 / screen.refreshRate()), 1)
+
+    def add_target(self, labels, clear_on_status=False):
+        # labels maps "realtime", "hindi" and "english" to QLabels
+        desired = {role: label.text() for role, label in labels.items()}
+        for label in labels.values():
+            if isinstance(label, SubtitleLabel):
+                label.paint_observer = self.record_paint
+        self.targets.append((labels, clear_on_status, desired))
+
+    def submit(self, data):
+        kind = data.get("type")
+        for labels, clear_on_status, desired in self.targets:
+            if kind == "realtime":
+                desired.update(realtime=data.get("hindi", ""), hindi="", english="")
+            elif kind == "final":
+                desired.update(realtime="", hindi=data.get("hindi", ""), english=data.get("english", ""))
+            elif clear_on_status:
+                desired.update(realtime="", hindi="", english="")
+        if self.dirty:
+            self.dropped_updates += 1 # The previous update was never painted
+        self.dirty = True
+        if not self.timer.isActive():
+            self.timer.start(self.frame_interval_ms)
+
+    def paint(self):
+        changed = False
+        for labels, _, desired in self.targets:
+            for role, label in labels.items():
+                if label.text() != desired[role]:
+                    label.setText(desired[role])
+                    changed = True
+        self.dirty = False
+        self.frames += 1
+        if changed:
+            self._applied_at = time.perf_counter()
+            self.last_paint_ms = 0.0
+
+    def record_paint(self, started, finished):
+        # Several labels paint per frame; they add up until the next update is applied
+        if self._applied_at is None or started < self._applied_at:
+            return # Repaint not caused by an update (expose, resize)
+        self.last_paint_ms += (finished - started) * 1000
+        self.max_paint_ms = max(self.max_paint_ms, self.last_paint_ms)
+        self.last_latency_ms = (finished - self._applied_at) * 1000
+        self.max_latency_ms = max(self.max_latency_ms, self.last_latency_ms)
+
+    def stats_text(self):
+        return (f"Render: paint {self.last_paint_ms:.2f} ms last, {self.max_paint_ms:.2f} ms max; "
+                f"update to screen {self.last_latency_ms:.1f} ms last, {self.max_latency_ms:.1f} ms max; "
+                f"{self.frames} frames, {self.dropped_updates} dropped updates")
+
 class OverlayWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -100,19 +238,19 @@ class OverlayWindow(QMainWindow):
         layout.setSpacing(10)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
-        self.hindi_realtime_label = QLabel("")
+        self.hindi_realtime_label = SubtitleLabel("")
         self.hindi_realtime_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.hindi_realtime_label.setStyleSheet("color: #888; font-size: 40px;")
         self.hindi_realtime_label.setWordWrap(True)
         layout.addWidget(self.hindi_realtime_label)
 
-        self.hindi_final_label = QLabel("")
+        self.hindi_final_label = SubtitleLabel("")
         self.hindi_final_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.hindi_final_label.setStyleSheet("color: #ccc; font-size: 45px;")
         self.hindi_final_label.setWordWrap(True)
         layout.addWidget(self.hindi_final_label)
 
-        self.english_final_label = QLabel("")
+        self.english_final_label = SubtitleLabel("")
         self.english_final_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.english_final_label.setStyleSheet("color: white; font-size: 50px;")
         self.english_final_label.setWordWrap(True)
@@ -120,20 +258,12 @@ class OverlayWindow(QMainWindow):
 
         self.setGeometry(100, 100, 800, 300) # Initial size and position
 
-    def update_subtitles(self, data):
-        if data.get("type") == "realtime":
-            self.hindi_realtime_label.setText(data.get("hindi", ""))
-            self.hindi_final_label.setText("")
-            self.english_final_label.setText("")
-        elif data.get("type") == "final":
-            self.hindi_final_label.setText(data.get("hindi", ""))
-            self.english_final_label.setText(data.get("english", ""))
-            self.hindi_realtime_label.setText("") # Clear real-time when final arrives
-        else:
-            # Clear all on status/error or unknown types
-            self.hindi_realtime_label.setText("")
-            self.hindi_final_label.setText("")
-            self.english_final_label.setText("")
+    def subtitle_labels(self):
+        return {
+            "realtime": self.hindi_realtime_label,
+            "hindi": self.hindi_final_label,
+            "english": self.english_final_label,
+        }
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -147,13 +277,17 @@ class MainWindow(QMainWindow):
         self.main_layout.setContentsMargins(20, 20, 20, 20)
         self.main_layout.setSpacing(15)
 
+        self.renderer = SubtitleRenderer()
+
         self.ws_client = WebSocketClient("ws://localhost:8768")
         self.ws_client.message_received.connect(self.handle_websocket_message)
+        self.ws_client.realtime_pending.connect(self.handle_realtime_pending)
         self.ws_client.connected.connect(self.on_websocket_connected)
         self.ws_client.disconnected.connect(self.on_websocket_disconnected)
         self.ws_client.start()
 
         self.overlay_window = None
+        self.pacing_generation = 0 # Bumped on every new subtitle so stale paced segments are skipped
 
         self.status_label = QLabel("Status: Disconnected")
         self.listening_indicator = QLabel("Listening...")
@@ -165,16 +299,17 @@ class MainWindow(QMainWindow):
         self.choose_file_btn = QPushButton("Choose file")
         self.upload_audio_btn = QPushButton("Upload Audio")
         self.main_hindi_realtime_label = QLabel("Real-time Hindi:")
-        self.main_hindi_realtime_text = QLabel("")
+        self.main_hindi_realtime_text = SubtitleLabel("")
         self.main_hindi_final_label = QLabel("Final Hindi:")
-        self.main_hindi_final_text = QLabel("")
+        self.main_hindi_final_text = SubtitleLabel("")
         self.main_english_final_label = QLabel("Final English:")
-        self.main_english_final_text = QLabel("")
+        self.main_english_final_text = SubtitleLabel("")
         self.stt_engine_combo = QComboBox()
         self.google_api_key_input = QLineEdit()
         self.translation_engine_combo = QComboBox()
         self.deepl_api_key_input = QLineEdit()
         self.save_config_btn = QPushButton("Save Configuration")
+        self.render_stats_label = QLabel("")
 
         self.init_ui()
         self.load_config()
@@ -308,6 +443,19 @@ class MainWindow(QMainWindow):
 
         self.main_layout.addWidget(config_group_box)
 
+        # Renderer paint times and dropped-update count, refreshed once a second
+        self.render_stats_label.setStyleSheet("color: #888; font-size: 0.9em;")
+        self.main_layout.addWidget(self.render_stats_label)
+        self.render_stats_timer = QTimer(self)
+        self.render_stats_timer.timeout.connect(self.update_render_stats)
+        self.render_stats_timer.start(1000)
+
+        self.renderer.add_target({
+            "realtime": self.main_hindi_realtime_text,
+            "hindi": self.main_hindi_final_text,
+            "english": self.main_english_final_text,
+        })
+
         # Set dark theme
         self.set_dark_theme()
 
@@ -343,25 +491,52 @@ class MainWindow(QMainWindow):
 
     def handle_websocket_message(self, data):
         if data.get("type") == "realtime":
-            self.main_hindi_realtime_text.setText(data.get("hindi", ""))
-            self.main_hindi_final_text.setText("")
-            self.main_english_final_text.setText("")
-            if self.overlay_window:
-                self.overlay_window.update_subtitles(data)
+            self.pacing_generation += 1
+            self.renderer.submit(data)
         elif data.get("type") == "final":
-            self.main_hindi_final_text.setText(data.get("hindi", ""))
-            self.main_english_final_text.setText(data.get("english", ""))
-            self.main_hindi_realtime_text.setText("") # Clear real-time when final arrives
-            if self.overlay_window:
-                self.overlay_window.update_subtitles(data)
+            self.pacing_generation += 1
+            timed = [s for s in data.get("segments") or [] if s.get("start") is not None]
+            if len(timed) > 1:
+                self.pace_segments(data, timed)
+            else:
+                self.show_final(data)
+        elif data.get("type") == "history":
+            # Replayed finals arrive in order; showing the newest brings the display up to date
+            entries = data.get("entries", [])
+            if entries:
+                self.show_final(entries[-1])
         elif data.get("type") == "status":
             self.update_status(data.get("english", ""), False)
-            if self.overlay_window:
-                self.overlay_window.update_subtitles(data) # Clear overlay on status
+            self.renderer.submit(data) # Clears the overlay
+        elif data.get("type") == "busy":
+            # Upload queued behind others (position set) or rejected (position null)
+            self.update_status(data.get("english", ""), data.get("position") is None)
         elif data.get("type") == "error":
             self.update_status(data.get("english", ""), True)
-            if self.overlay_window:
-                self.overlay_window.update_subtitles(data) # Clear overlay on error
+            self.renderer.submit(data) # Clears the overlay
+
+    def update_render_stats(self):
+        self.render_stats_label.setText(
+            f"{self.renderer.stats_text()}, {self.ws_client.coalesced_partials} partials skipped before the UI"
+        )
+
+    def handle_realtime_pending(self):
+        data = self.ws_client.take_realtime()
+        if data:
+            self.handle_websocket_message(data)
+
+    def show_final(self, data):
+        self.renderer.submit(dict(data, type="final")) # Clears real-time when final arrives
+
+    def pace_segments(self, data, segments):
+        # Show each segment at its offset into the audio instead of one giant block
+        generation = self.pacing_generation
+        for segment in segments:
+            segment_data = dict(data, hindi=segment.get("text", ""), english=segment.get("english", ""))
+            QTimer.singleShot(
+                int(segment["start"] * 1000),
+                lambda d=segment_data: generation == self.pacing_generation and self.show_final(d)
+            )
 
     def start_listening(self):
         device_info = self.audio_input_combo.currentData()
@@ -405,7 +580,9 @@ class MainWindow(QMainWindow):
     def open_overlay(self):
         if not self.overlay_window:
             self.overlay_window = OverlayWindow()
+            self.renderer.add_target(self.overlay_window.subtitle_labels(), clear_on_status=True)
         self.overlay_window.showFullScreen() # Show as fullscreen overlay
+        self.renderer.use_screen(self.overlay_window.screen())
 
     def test_audio_input(self):
         device_info = self.audio_input_combo.currentData()